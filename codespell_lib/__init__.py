@@ -1,4 +1,23 @@
-from ._codespell import _script_main, main
+from typing import TYPE_CHECKING
+
 from ._version import __version__  # type: ignore[import-not-found]
 
-__all__ = ["__version__", "_script_main", "main"]
+if TYPE_CHECKING:
+    from ._codespell import Spellchecker, _script_main, main
+    from ._output import Finding
+
+__all__ = ["Finding", "Spellchecker", "__version__", "_script_main", "main"]
+
+
+def __getattr__(name: str) -> object:
+    # imported on first use, codespell-client not needing the checker
+    if name in {"Spellchecker", "_script_main", "main"}:
+        from . import _codespell
+
+        return getattr(_codespell, name)
+    if name == "Finding":
+        from ._output import Finding
+
+        return Finding
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
@@ -0,0 +1,183 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import hashlib
+import json
+import os
+import stat
+import time
+from collections.abc import Callable
+from typing import Any, BinaryIO, Optional, Union
+
+# Output captured about a file: text, and findings and warnings kept as the
+# lists of their fields without the name of the file.
+FileOutput = list[Union[str, list[Any]]]
+# bad count, captured stdout and stderr, and the Summary counts of one file
+FileResult = tuple[int, FileOutput, FileOutput, dict[str, int]]
+
+# Bump whenever the layout of the results cache entries changes.
+_RESULTS_CACHE_VERSION = 2
+# Files modified this recently may still change within the resolution of
+# their mtime, so their entry is always validated against the content.
+_RACY_MTIME_NS = 2_000_000_000
+# Size of the reads of files being hashed, so that large ones are not read
+# into memory at once.
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_digest(f: BinaryIO) -> str:
+    """Return the digest of the content of a binary file, read in chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultsCache:
+    """Per-file results persisted between runs.
+
+    Entries are keyed by a fingerprint of the effective configuration and
+    the path of the file, both absolute and as reported, since the output
+    holds the latter. They are reused when the size, mtime and inode
+    of the file are unchanged, or else when its content hashes the same.
+    """
+
+    def __init__(self, cache_dir: str, fingerprint: str, max_size: int) -> None:
+        self.results_dir = os.path.join(cache_dir, "results")
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        # entries written by this process, so evict() only runs when needed
+        self.stored = 0
+
+    def _entry_path(self, filename: str) -> str:
+        path = f"{os.path.abspath(filename)}\0{filename}"
+        key = _digest(f"{self.fingerprint}\0{path}".encode())
+        return os.path.join(self.results_dir, key[:2], key)
+
+    def _load(self, entry_path: str) -> Optional[dict[str, Any]]:
+        try:
+            with open(entry_path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def _store(self, entry_path: str, entry: dict[str, Any]) -> None:
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        else:
+            self.stored += 1
+
+    def fetch(
+        self,
+        filename: str,
+        compute: Callable[[], FileResult],
+        st: Optional[os.stat_result] = None,
+        digest: Optional[str] = None,
+    ) -> FileResult:
+        """Return the cached result of filename, calling compute() on a miss.
+
+        st is the status of the file and digest the file_digest() of its
+        content, when already known.
+        """
+        if st is None:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                return compute()
+        if not stat.S_ISREG(st.st_mode):
+            return compute()
+        file_stat = [st.st_size, st.st_mtime_ns, st.st_ino]
+        entry_path = self._entry_path(filename)
+        entry = self._load(entry_path)
+        if entry is not None and entry.get("stat") == file_stat:
+            try:
+                os.utime(entry_path)  # most recently used
+            except OSError:
+                pass
+            return tuple(entry["result"])  # type: ignore[return-value]
+
+        if digest is None:
+            try:
+                with open(filename, "rb") as f:
+                    digest = file_digest(f)
+            except OSError:
+                return compute()
+        if entry is not None and entry.get("digest") == digest:
+            result: FileResult = tuple(entry["result"])  # type: ignore[assignment]
+        else:
+            result = compute()
+        racy = time.time_ns() - st.st_mtime_ns < _RACY_MTIME_NS
+        self._store(
+            entry_path,
+            {
+                "stat": None if racy else file_stat,
+                "digest": digest,
+                "result": result,
+            },
+        )
+        return result
+
+    def evict(self) -> None:
+        """Delete the least recently used entries above the size limit."""
+        entries = []
+        total_size = 0
+        try:
+            subdirs = os.scandir(self.results_dir)
+        except OSError:
+            return
+        with subdirs:
+            for subdir in subdirs:
+                try:
+                    with os.scandir(subdir.path) as it:
+                        for entry in it:
+                            st = entry.stat()
+                            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                            total_size += st.st_size
+                except OSError:
+                    continue
+        if total_size <= self.max_size:
+            return
+        # Make some room so that the next runs do not evict again right away.
+        target_size = self.max_size * 9 // 10
+        for _, size, path in sorted(entries):
+            if total_size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+
+def results_cache_fingerprint(*parts: object) -> str:
+    """Fingerprint the configuration that affects the results of files."""
+    return _digest(repr((_RESULTS_CACHE_VERSION, *parts)).encode())
@@ -17,21 +17,34 @@ Copyright (C) 2011  ProFUSION embedded systems
 """
 
 import argparse
+import bisect
+import codecs
+import collections
 import configparser
+import contextlib
 import ctypes
 import fnmatch
+import functools
+import io
 import itertools
+import locale
 import os
 import re
 import shlex
+import stat
 import sys
 import textwrap
-from collections.abc import Iterable, Sequence
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from re import Match, Pattern
 from typing import (
     Any,
+    BinaryIO,
+    NamedTuple,
+    NoReturn,
     Optional,
     TextIO,
+    TypeVar,
 )
 
 if sys.platform == "win32":
@@ -40,7 +53,29 @@ if sys.platform == "win32":
     ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
     STD_OUTPUT_HANDLE = wintypes.HANDLE(-11)
 
-from ._spellchecker import Misspelling, build_dict
+from ._cache import (
+    FileOutput,
+    FileResult,
+    ResultsCache,
+    file_digest,
+    results_cache_fingerprint,
+)
+from ._diff import FilePatch, parse_unified_diff
+from ._git import GitError, changed_files, ls_files, unified_diff
+from ._output import (
+    Finding,
+    JsonLinesWriter,
+    SarifWriter,
+    format_finding,
+)
+from ._spellchecker import (
+    Misspelling,
+    Misspellings,
+    _dict_cache_key,
+    build_dict,
+    build_dict_cached,
+)
+from ._stats import RunStats
 from ._text_util import fix_case
 
 # autogenerated by setuptools_scm
@@ -49,6 +84,8 @@ from ._version import (  # type: ignore[import-not-found]
 )
 
 word_regex_def = r"[\w\-'’]+"  # noqa: RUF001
+# Match the same words as word_regex_def in ASCII text, faster.
+_ascii_word_regex = re.compile(r"[\w\-']+", re.ASCII)
 # While we want to treat characters like ( or " as okay for a starting break,
 # these may occur unescaped in URIs, and so we are more restrictive on the
 # endpoint.  Emails are more restrictive, so the endpoint remains flexible.
@@ -156,6 +193,9 @@ EX_USAGE = 64
 EX_DATAERR = 65
 EX_CONFIG = 78
 
+# default files the --profile kinds are written to
+PROFILE_OUTPUTS = {"cpu": "codespell-cpu.prof", "mem": "codespell-mem.txt"}
+
 # OPTIONS:
 #
 # ARGUMENTS:
@@ -174,12 +214,57 @@ class QuietLevels:
     CONFIG_FILES = 32
 
 
+_glob_magic_regex = re.compile(r"[*?[]")
+
+
+def _compile_globs(globs: Iterable[str]) -> Callable[[str], bool]:
+    """Return a function telling whether a name matches any of globs.
+
+    Globs without wildcards are looked up in a set and "*suffix" globs are
+    checked with str.endswith(), the others are combined into one regex.
+    """
+    literals: set[str] = set()
+    suffixes: list[str] = []
+    regexes: list[str] = []
+    for glob in map(os.path.normcase, globs):
+        if not _glob_magic_regex.search(glob):
+            literals.add(glob)
+        elif glob.startswith("*") and not _glob_magic_regex.search(glob, 1):
+            suffixes.append(glob[1:])
+        else:
+            regexes.append(fnmatch.translate(glob))
+    suffixes_tuple = tuple(suffixes)
+    regex_match = re.compile("|".join(regexes)).match if regexes else None
+
+    def match(name: str) -> bool:
+        return (
+            name in literals
+            or name.endswith(suffixes_tuple)
+            or (regex_match is not None and regex_match(name) is not None)
+        )
+
+    return match
+
+
 class GlobMatch:
+    """Match file and directory names against globs, as fnmatch does.
+
+    Globs ending with a path separator match directories only.
+    """
+
     def __init__(self, pattern: list[str]) -> None:
         self.pattern_list: list[str] = pattern
+        separators = tuple(filter(None, ("/", os.sep, os.altsep)))
+        file_globs = [p for p in pattern if not p.endswith(separators)]
+        dir_globs = [p.rstrip("".join(separators)) for p in pattern]
+        self._match_file = _compile_globs(file_globs)
+        self._match_dir = _compile_globs(dir_globs)
 
     def match(self, filename: str) -> bool:
-        return any(fnmatch.fnmatch(filename, p) for p in self.pattern_list)
+        return self._match_file(os.path.normcase(filename))
+
+    def match_dir(self, dirname: str) -> bool:
+        return self._match_dir(os.path.normcase(dirname))
 
 
 class TermColors:
@@ -206,6 +291,10 @@ class Summary:
         else:
             self.summary[wrongword] = 1
 
+    def merge(self, counts: dict[str, int]) -> None:
+        for wrongword, count in counts.items():
+            self.summary[wrongword] = self.summary.get(wrongword, 0) + count
+
     def __str__(self) -> str:
         keys = list(self.summary.keys())
         keys.sort()
@@ -246,41 +335,49 @@ class FileOpener:
         self.encdetector = UniversalDetector()
 
     def open(self, filename: str) -> tuple[list[tuple[bool, int, list[str]]], str]:
-        if self.use_chardet:
-            return self.open_with_chardet(filename)
-        return self.open_with_internal(filename)
+        with open(filename, "rb") as f:
+            data = f.read()
+        return self.decode(data, filename)
 
-    def open_with_chardet(
-        self, filename: str
+    def decode(
+        self, data: bytes, filename: str
     ) -> tuple[list[tuple[bool, int, list[str]]], str]:
+        """Split the content of a file into fragments of lines."""
+        if self.use_chardet:
+            return self.decode_with_chardet(data, filename)
+        return self.decode_with_internal(data, filename)
+
+    def detect_encoding(self, f: Iterable[bytes]) -> str:
         self.encdetector.reset()
-        with open(filename, "rb") as fb:
-            for line in fb:
-                self.encdetector.feed(line)
-                if self.encdetector.done:
-                    break
+        for line in f:
+            self.encdetector.feed(line)
+            if self.encdetector.done:
+                break
         self.encdetector.close()
         encoding = self.encdetector.result["encoding"]
+        # like open(), fall back to the locale encoding
+        return encoding or locale.getpreferredencoding(False)
+
+    def decode_with_chardet(
+        self, data: bytes, filename: str
+    ) -> tuple[list[tuple[bool, int, list[str]]], str]:
+        encoding = self.detect_encoding(io.BytesIO(data))
 
         try:
-            f = open(filename, encoding=encoding, newline="")
+            text = data.decode(encoding)
         except UnicodeDecodeError:
-            print(f"ERROR: Could not detect encoding: {filename}", file=sys.stderr)
+            _print_file_warning("ERROR: Could not detect encoding", filename)
             raise
         except LookupError:
-            print(
-                f"ERROR: Don't know how to handle encoding {encoding}: {filename}",
-                file=sys.stderr,
+            _print_file_warning(
+                f"ERROR: Don't know how to handle encoding {encoding}", filename
             )
             raise
-        else:
-            lines = self.get_lines(f)
-            f.close()
 
-        return lines, f.encoding
+        return self.get_lines(io.StringIO(text, newline="")), encoding
 
-    def open_with_internal(
-        self, filename: str
+    def decode_with_internal(
+        self, data: bytes, filename: str
     ) -> tuple[list[tuple[bool, int, list[str]]], str]:
         encoding = None
         first_try = True
@@ -289,24 +386,22 @@ class FileOpener:
                 first_try = False
             elif not self.quiet_level & QuietLevels.ENCODING:
                 print(f'WARNING: Trying next encoding "{encoding}"', file=sys.stderr)
-            with open(filename, encoding=encoding, newline="") as f:
-                try:
-                    lines = self.get_lines(f)
-                except UnicodeDecodeError:
-                    if not self.quiet_level & QuietLevels.ENCODING:
-                        print(
-                            f'WARNING: Cannot decode file using encoding "{encoding}": '
-                            f"{filename}",
-                            file=sys.stderr,
-                        )
-                else:
-                    break
+            try:
+                text = data.decode(encoding)
+            except UnicodeDecodeError:
+                if not self.quiet_level & QuietLevels.ENCODING:
+                    _print_file_warning(
+                        f'WARNING: Cannot decode file using encoding "{encoding}"',
+                        filename,
+                    )
+            else:
+                break
         else:
-            # reading with encoding "iso-8859-1" cannot fail with UnicodeDecodeError
+            # decoding with encoding "iso-8859-1" cannot fail with UnicodeDecodeError
             msg = "Unknown encoding"
             raise RuntimeError(msg)  # pragma: no cover
 
-        return lines, encoding
+        return self.get_lines(io.StringIO(text, newline="")), encoding
 
     def get_lines(self, f: TextIO) -> list[tuple[bool, int, list[str]]]:
         fragments = []
@@ -399,7 +494,15 @@ def _supports_ansi_colors() -> bool:
 
 def parse_options(
     args: Sequence[str],
+    *,
+    exit_on_error: bool = True,
 ) -> tuple[argparse.Namespace, argparse.ArgumentParser, list[str]]:
+    """Parse the command line args, and the options of the config files.
+
+    Invalid options print the usage and exit, or raise ValueError without
+    printing anything unless exit_on_error.
+    """
+
     # Split lines read from `@PATH` using shlex.split(), otherwise default
     # behaviour is to have one arg per line. See:
     # https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.convert_arg_line_to_args
@@ -416,6 +519,11 @@ def parse_options(
                 ret = shlex.split(arg_line)
             return ret
 
+        def error(self, message: str) -> NoReturn:
+            if not exit_on_error:
+                raise ValueError(message)
+            super().error(message)
+
     parser = ArgumentParser2(
         formatter_class=NewlineHelpFormatter,
         fromfile_prefix_chars="@",
@@ -549,6 +657,16 @@ def parse_options(
         help="print summary of fixes",
     )
 
+    parser.add_argument(
+        "--format",
+        choices=("text", "jsonl", "sarif"),
+        default="text",
+        help="how to report misspellings: as text (the default), as JSON "
+        "lines or as a SARIF log. JSON lines have the file, line, column, "
+        "word, correction, reason and fixable keys, line 0 being the file "
+        "name. Neither has colors, context or summary.",
+    )
+
     parser.add_argument(
         "--count",
         action="store_true",
@@ -556,6 +674,17 @@ def parse_options(
         help="print the number of errors as the last line of stderr",
     )
 
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        default=False,
+        help="print the time spent in each phase of the run and counters, "
+        "e.g. of the files skipped and of the candidate lines, those that may "
+        "hold a misspelling and are checked in full, to stderr on exit. They "
+        "are printed as a table, or as JSON with --format=jsonl or "
+        "--format=sarif. Cannot be used together with --jobs.",
+    )
+
     parser.add_argument(
         "-S",
         "--skip",
@@ -563,7 +692,8 @@ def parse_options(
         help="comma-separated list of files to skip. It "
         "accepts globs as well. E.g.: if you want "
         "codespell to skip .eps and .txt files, "
-        'you\'d give "*.eps,*.txt" to this option.',
+        'you\'d give "*.eps,*.txt" to this option. '
+        "Globs ending with / only match directories.",
     )
 
     parser.add_argument(
@@ -641,6 +771,58 @@ def parse_options(
         default=False,
         help='check hidden files and directories (those starting with ".") as well.',
     )
+    parser.add_argument(
+        "--files-from",
+        type=str,
+        metavar="FILE",
+        help="also check the files or directories listed in FILE, or read "
+        'from stdin if FILE is "-", in the order listed. Paths are separated '
+        "by NUL characters, e.g. from find -print0 or git ls-files -z, or "
+        "else by line endings. The list is read as the files are checked.",
+    )
+    parser.add_argument(
+        "--git-files",
+        action="store_true",
+        default=False,
+        help="only check the files tracked by git in the directories given, "
+        "instead of walking them. Untracked and ignored files are not "
+        "checked. --skip and the rules for hidden files still apply.",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=("inode", "content"),
+        help="check a file reached through several paths, e.g. hard or "
+        'symbolic links, only once ("inode"). With "content", files with '
+        "the same content are also checked once, and the misspellings "
+        "found in it are reported under the name of each file.",
+    )
+    parser.add_argument(
+        "--changed-since",
+        type=str,
+        metavar="REV",
+        help="only check the files in the directories given that changed "
+        "since the git revision REV, as listed by git diff, e.g. main or "
+        "main...HEAD. Deleted files are ignored. --skip and the rules for "
+        "hidden files still apply.",
+    )
+    parser.add_argument(
+        "--changed-lines-only",
+        action="store_true",
+        default=False,
+        help="with --changed-since, only check the lines added or modified "
+        "since REV instead of the whole files.",
+    )
+    parser.add_argument(
+        "--diff",
+        type=str,
+        metavar="PATCH",
+        help="only check the lines added by the unified diff PATCH, or by "
+        'the diff read from stdin if PATCH is "-". The files must be below '
+        "the directories given, relative to which the paths in the diff "
+        "are, or below the current directory for the files given. Files "
+        "that agree with the diff are read as well, so that "
+        "directives on lines outside of the hunks apply.",
+    )
     parser.add_argument(
         "-A",
         "--after-context",
@@ -674,6 +856,62 @@ def parse_options(
         action="store_true",
         help="output just a single line for each misspelling in stdin mode",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of processes used to check files. 0 uses one process "
+        "per CPU. The output is the same as when checking files one by one. "
+        "The default is %(default)s.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        metavar="DIR",
+        help="directory used to cache data between runs, such as the "
+        "parsed dictionaries. The cache is invalidated automatically when "
+        "its inputs change. Unless --write-changes is used, the results of "
+        "unchanged files are reused as well. Defaults to empty/disabled.",
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="maximum size of the cached results in megabytes, above which "
+        "the least recently used ones are deleted. "
+        "The default is %(default)s.",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=("cpu", "mem"),
+        help="profile the run, to report why it is slow: with cpu the time "
+        "spent in each function is measured with cProfile, with mem the "
+        "memory allocated by each line when the most is in use with "
+        "tracemalloc. Files checked by "
+        "--jobs workers are not profiled.",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        help="where to write the profile, in the pstats format with "
+        "--profile=cpu, e.g. for python -m pstats, and as a report of the "
+        "lines allocating the most memory with --profile=mem. The default "
+        f"is {' or '.join(PROFILE_OUTPUTS.values())}.",
+    )
+    parser.add_argument(
+        "--daemon",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="keep running and check files on behalf of codespell-client, "
+        "listening on the Unix domain socket SOCKET. The dictionaries are "
+        "kept in memory between requests. Defaults to $CODESPELL_SOCKET, "
+        "else $XDG_RUNTIME_DIR/codespell.sock, else a per-user socket in "
+        "the temporary directory.",
+    )
     parser.add_argument("--config", type=str, help="path to config file.")
     parser.add_argument("--toml", type=str, help="path to a pyproject.toml file.")
     parser.add_argument("files", nargs="*", help="files or directories to check")
@@ -746,7 +984,7 @@ def parse_options(
         # Re-parse command line options to override config.
         options = parser.parse_args(list(args), namespace=options)
 
-    if not options.files:
+    if not options.files and options.files_from is None:
         options.files.append(".")
 
     return options, parser, used_cfg_files
@@ -800,10 +1038,9 @@ def is_hidden(filename: str, check_hidden: bool) -> bool:
     )
 
 
-def is_text_file(filename: str) -> bool:
-    with open(filename, mode="rb") as f:
-        s = f.read(1024)
-    return b"\x00" not in s
+def is_text(data: bytes) -> bool:
+    """Tell whether the content of a file, or its start, is text."""
+    return b"\x00" not in data[:1024]
 
 
 def ask_for_word_fix(
@@ -963,47 +1200,283 @@ def _format_colored_output(
     return cfilename, cline, cwrongword, crightword
 
 
-def parse_lines(
-    fragment: tuple[bool, int, list[str]],
-    filename: str,
-    colors: TermColors,
-    summary: Optional[Summary],
-    misspellings: dict[str, Misspelling],
+def _format_file_finding(
+    filename: str, finding: Finding, colors: TermColors, output_format: str
+) -> str:
+    """Return the line reporting finding in the content of filename."""
+    if output_format != "text":
+        return format_finding(filename, finding, output_format)
+    cfilename, cline, cwrongword, crightword = _format_colored_output(
+        filename, colors, finding.line, finding.word, finding.correction
+    )
+    reason = finding.reason
+    creason = f"  | {colors.FILE}{reason}{colors.DISABLE}" if reason else ""
+    return f"{cfilename}:{cline}: {cwrongword} ==> {crightword}{creason}"
+
+
+def _print_finding(
+    filename: str, finding: Finding, colors: TermColors, output_format: str
+) -> None:
+    """Print finding in the content of filename.
+
+    Captured, it is kept apart from the name of the file.
+    """
+    if isinstance(sys.stdout, _FileOutputCapture):
+        sys.stdout.add(list(finding))
+    else:
+        line = _format_file_finding(filename, finding, colors, output_format)
+        sys.stdout.write(line + "\n")
+
+
+def _print_file_warning(message: str, filename: str) -> None:
+    """Print message about filename to stderr, followed by the name of the file.
+
+    Captured, it is kept apart from the name of the file.
+    """
+    if isinstance(sys.stderr, _FileOutputCapture):
+        sys.stderr.add([message])
+    else:
+        print(f"{message}: {filename}", file=sys.stderr)
+
+
+# Verdict on a word: None for words that are not reported, or else their key
+# in the dictionary and its entry.
+WordVerdict = Optional[tuple[str, Misspelling]]
+_WORD_VERDICTS_SIZE = 1 << 16
+
+
+class _WordVerdicts:
+    """The cached verdicts on the words seen with some dictionaries.
+
+    Inline ignores are specific to lines, so they are applied to the
+    verdicts afterwards, as are the fixes of the entries, which interactive
+    mode can change. The cache is not pickled, each worker process keeping
+    its own.
+    """
+
+    def __init__(
+        self,
+        misspellings: Mapping[str, Misspelling],
+        ignore_words_cased: set[str],
+    ) -> None:
+        self.misspellings = misspellings
+        self.ignore_words_cased = ignore_words_cased
+        self.verdict = functools.lru_cache(maxsize=_WORD_VERDICTS_SIZE)(self._lookup)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return _WordVerdicts, (self.misspellings, self.ignore_words_cased)
+
+    def _lookup(self, word: str) -> WordVerdict:
+        if word in self.ignore_words_cased:
+            return None
+        lword = word.lower()
+        misspelling = self.misspellings.get(lword)
+        if misspelling is None:
+            return None
+        return lword, misspelling
+
+    def stats(self) -> tuple[int, int]:
+        """Return the hits and misses of the cache."""
+        info = self.verdict.cache_info()
+        return info.hits, info.misses
+
+
+# The timings and counters of the run with --stats, if any.
+_run_stats: Optional[RunStats] = None
+
+
+def _enter_phase(phase: str) -> None:
+    if _run_stats is not None:
+        _run_stats.enter(phase)
+
+
+def _count(counter: str, n: int = 1) -> None:
+    if _run_stats is not None:
+        _run_stats.counters[counter] += n
+
+
+def _ignore_next_line_words(line: str) -> Optional[set[str]]:
+    """Return the words of an ignore-next-line directive (empty for all)."""
+    if codespell_ignore_next_line_tag in line:
+        nl_match = ignore_next_line_regex.search(line)
+        if nl_match:
+            return set(filter(None, (nl_match.group("words") or "").split(",")))
+    return None
+
+
+def _tokenizes_exactly(
+    word_regex: Pattern[str],
+    ignore_word_regex: Optional[Pattern[str]],
+    uri_ignore_words: set[str],
+) -> bool:
+    """Tell whether words can be extracted from many lines at once.
+
+    Only then is a line guaranteed to produce no finding when none of the
+    words extracted from the joined text of the lines is a candidate.
+    """
+    return (
+        word_regex.pattern in {word_regex_def, _ascii_word_regex.pattern}
+        and ignore_word_regex is None
+        and "*" not in uri_ignore_words
+    )
+
+
+def _candidate_words(
+    text: str,
+    misspellings: Mapping[str, Misspelling],
+    ignore_words_cased: set[str],
+    word_regex: Pattern[str],
+) -> set[str]:
+    """Return the distinct words of text that may be reported."""
+    words = set(word_regex.findall(text))
+    # Most words are not misspelled, which set operations tell the fastest.
+    misspelled = misspellings.keys() & set(map(str.lower, words))
+    if not misspelled:
+        return set()
+    return {
+        word
+        for word in words
+        if word not in ignore_words_cased and word.lower() in misspelled
+    }
+
+
+# Above this many candidate words, finding their lines by matching words is
+# faster than searching for each of them.
+_MAX_SEARCHED_CANDIDATES = 8
+
+
+def _candidate_lines(
+    lines: Sequence[str],
+    candidate_words: set[str],
+    word_regex: Pattern[str],
+) -> list[int]:
+    """Find the lines that may contain any of the candidate words.
+
+    The text of all lines is searched at once, and offsets are mapped back
+    to line indices using the offsets at which lines end.
+    """
+    if not candidate_words:
+        return []
+    text = "".join(lines)
+    line_ends = list(itertools.accumulate(map(len, lines)))
+    if len(candidate_words) > _MAX_SEARCHED_CANDIDATES:
+        candidates: list[int] = []
+        for match in word_regex.finditer(text):
+            if match.group() in candidate_words:
+                i = bisect.bisect_right(line_ends, match.start())
+                if not candidates or candidates[-1] != i:
+                    candidates.append(i)
+        return candidates
+
+    # Substring matches are a superset of word matches, and the lines are
+    # checked precisely afterwards.
+    found: set[int] = set()
+    for word in candidate_words:
+        pos = text.find(word)
+        while pos >= 0:
+            i = bisect.bisect_right(line_ends, pos)
+            found.add(i)
+            pos = text.find(word, line_ends[i])
+    return sorted(found)
+
+
+def _is_word_char(char: str) -> bool:
+    # what \w matches in str patterns
+    return char.isalnum() or char == "_"
+
+
+def _at_word_boundary(text: str, pos: int) -> bool:
+    """Tell whether \\b would match at pos in text."""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def _word_occurrences(text: str, word: str) -> Iterator[int]:
+    """Yield where re.sub(rf"\\b{word}\\b", ...) would replace word in text."""
+    pos = text.find(word)
+    while pos >= 0:
+        end = pos + len(word)
+        if _at_word_boundary(text, pos) and _at_word_boundary(text, end):
+            yield pos
+            pos = text.find(word, end)
+        else:
+            pos = text.find(word, pos + 1)
+
+
+def _replace_words(text: str, fixes: Mapping[str, str]) -> str:
+    """Replace the words of fixes in text with their fix, word after word.
+
+    This does what re.sub(rf"\\b{word}\\b", fixword, text) for each word
+    in turn does, without compiling a regex for each word, as long as fixes
+    start and end with word characters where their words do. A fix may so
+    produce a word that a later one replaces again.
+    """
+    for word, fixword in fixes.items():
+        parts = []
+        pos = 0
+        for start in _word_occurrences(text, word):
+            parts.append(text[pos:start])
+            parts.append(fixword)
+            pos = start + len(word)
+        if parts:
+            parts.append(text[pos:])
+            text = "".join(parts)
+    return text
+
+
+def _iter_misspellings(
+    lines: list[str],
+    check_lines: Optional[Sequence[int]],
+    misspellings: Mapping[str, Misspelling],
     ignore_words_cased: set[str],
     exclude_lines: set[str],
     word_regex: Pattern[str],
     ignore_word_regex: Optional[Pattern[str]],
     uri_regex: Pattern[str],
     uri_ignore_words: set[str],
-    context: Optional[tuple[int, int]],
     options: argparse.Namespace,
-) -> tuple[int, bool, list[tuple[int, str, str]]]:
-    bad_count = 0
-    changed = False
-    changes_made: list[tuple[int, str, str]] = []
-
-    _, fragment_line_number, lines = fragment
+    word_verdicts: _WordVerdicts,
+) -> Iterator[tuple[int, str, Match[str], str, Misspelling, str]]:
+    """Find the misspellings in lines, or only in those at the check_lines indices.
+
+    Yield the index of the line, the line as checked, the match of the word,
+    the word in lowercase, its Misspelling and its fix in the case of the
+    word. Lines are read as they are checked, so that lines already checked
+    can be fixed meanwhile.
+    """
+    word_verdict = word_verdicts.verdict
+
+    if check_lines is None:
+        if _tokenizes_exactly(word_regex, ignore_word_regex, uri_ignore_words):
+            check_lines = _candidate_lines(
+                lines,
+                _candidate_words(
+                    "".join(lines), misspellings, ignore_words_cased, word_regex
+                ),
+                word_regex,
+            )
+        else:
+            check_lines = range(len(lines))
+    _count("candidate_lines", len(check_lines))
 
     next_line_ignore_words: Optional[set[str]] = None
+    previous_i = -1
 
-    for i, line in enumerate(lines):
-        line = line.rstrip()
+    for i in check_lines:
+        if i != previous_i + 1:
+            next_line_ignore_words = (
+                _ignore_next_line_words(lines[i - 1].rstrip()) if i > 0 else None
+            )
+        previous_i = i
+        line = lines[i].rstrip()
         # Apply any ignore-next-line directive carried from the previous line.
         pending_next_line_ignore = next_line_ignore_words
-        next_line_ignore_words = None
-
-        directive_words: set[str] = set()
-        if codespell_ignore_next_line_tag in line:
-            nl_match = ignore_next_line_regex.search(line)
-            if nl_match:
-                directive_words = set(
-                    filter(None, (nl_match.group("words") or "").split(","))
-                )
-                next_line_ignore_words = directive_words
+        next_line_ignore_words = _ignore_next_line_words(line)
+        directive_words = next_line_ignore_words or set()
 
         if not line or line in exclude_lines:
             continue
-        line_number = fragment_line_number + i
 
         extra_words_to_ignore: set[str] = set()
         match = (
@@ -1024,9 +1497,6 @@ def parse_lines(
                 continue
             extra_words_to_ignore |= pending_next_line_ignore
 
-        fixed_words = set()
-        asked_for = set()
-
         # If all URI spelling errors will be ignored, erase any URI before
         # extracting words. Otherwise, apply ignores after extracting words.
         # This ensures that if a URI ignore word occurs both inside a URI and
@@ -1045,212 +1515,537 @@ def parse_lines(
             )
         for match in check_matches:
             word = match.group()
-            if word in ignore_words_cased:
+            verdict = word_verdict(word)
+            if verdict is None:
+                continue
+            lword, misspelling = verdict
+            if lword in extra_words_to_ignore:
+                continue
+            # Sometimes we find a 'misspelling' which is actually a valid word
+            # preceded by a string escape sequence.  Ignore such cases as
+            # they're usually false alarms; see issue #17 among others.
+            char_before_idx = match.start() - 1
+            if (
+                char_before_idx >= 0
+                and line[char_before_idx] == "\\"
+                # bell, backspace, formfeed, newline, carriage-return, tab, vtab.
+                and word.startswith(("a", "b", "f", "n", "r", "t", "v"))
+                and lword[1:] not in misspellings
+            ):
                 continue
-            lword = word.lower()
-            if lword in misspellings and lword not in extra_words_to_ignore:
-                # Sometimes we find a 'misspelling' which is actually a valid word
-                # preceded by a string escape sequence.  Ignore such cases as
-                # they're usually false alarms; see issue #17 among others.
-                char_before_idx = match.start() - 1
-                if (
-                    char_before_idx >= 0
-                    and line[char_before_idx] == "\\"
-                    # bell, backspace, formfeed, newline, carriage-return, tab, vtab.
-                    and word.startswith(("a", "b", "f", "n", "r", "t", "v"))
-                    and lword[1:] not in misspellings
-                ):
-                    continue
 
-                # An "[sic]" marker right after the word flags it as an
-                # intentional/quoted spelling, so leave it alone.
-                if options.ignore_sic and sic_regex.match(line, match.end()):
-                    continue
+            # An "[sic]" marker right after the word flags it as an
+            # intentional/quoted spelling, so leave it alone.
+            if options.ignore_sic and sic_regex.match(line, match.end()):
+                continue
 
-                context_shown = False
-                fix = misspellings[lword].fix
-                fixword = fix_case(word, misspellings[lword].data)
-
-                if options.interactive and lword not in asked_for:
-                    if context is not None:
-                        context_shown = True
-                        print_context(lines, i, context)
-                    fix, fixword = ask_for_word_fix(
-                        lines[i],
-                        match,
-                        misspellings[lword],
-                        options.interactive,
-                        colors=colors,
-                        filename=filename,
-                        lineno=i + 1,
-                    )
-                    asked_for.add(lword)
+            yield i, line, match, lword, misspelling, fix_case(word, misspelling.data)
 
-                if summary and fix:
-                    summary.update(lword)
 
-                if word in fixed_words:  # can skip because of re.sub below
-                    continue
+class CheckArgs(NamedTuple):
+    """What files are checked with, passed to parse_file()."""
 
-                if options.write_changes and fix:
-                    new_line = re.sub(rf"\b{word}\b", fixword, lines[i])
-                    if new_line != lines[i]:
-                        changed = True
-                        lines[i] = new_line
-                        fixed_words.add(word)
-                        changes_made.append((line_number + 1, word, fixword))
-                        continue
-                    # Not found in the original line (e.g. --ignore-regex split
-                    # it out of a larger word), so report it instead (GH-2056).
-
-                # otherwise warning was explicitly set by interactive mode
-                if (
-                    options.interactive & 2
-                    and not fix
-                    and not misspellings[lword].reason
-                ):
-                    continue
+    colors: TermColors
+    summary: Optional[Summary]
+    misspellings: Mapping[str, Misspelling]
+    ignore_words_cased: set[str]
+    exclude_lines: set[str]
+    file_opener: FileOpener
+    word_regex: Pattern[str]
+    ignore_word_regex: Optional[Pattern[str]]
+    uri_regex: Pattern[str]
+    uri_ignore_words: set[str]
+    context: Optional[tuple[int, int]]
+    options: argparse.Namespace
+    word_verdicts: _WordVerdicts
 
-                cfilename, cline, cwrongword, crightword = _format_colored_output(
-                    filename, colors, line_number + 1, word, fixword
-                )
 
-                reason = misspellings[lword].reason
-                if reason:
-                    if options.quiet_level & QuietLevels.DISABLED_FIXES:
-                        continue
-                    creason = f"  | {colors.FILE}{reason}{colors.DISABLE}"
-                else:
-                    if options.quiet_level & QuietLevels.NON_AUTOMATIC_FIXES:
-                        continue
-                    creason = ""
+def parse_lines(
+    fragment: tuple[bool, int, list[str]],
+    filename: str,
+    check_args: CheckArgs,
+    *,
+    check_lines: Optional[Sequence[int]] = None,
+) -> tuple[int, bool, list[tuple[int, str, str]]]:
+    """Check the lines of a fragment, or only those at the check_lines indices.
 
-                # If we get to this point (uncorrected error) we should change
-                # our bad_count and thus return value
-                bad_count += 1
+    The other lines are still used for context and ignore-next-line
+    directives.
+    """
+    (
+        colors,
+        summary,
+        misspellings,
+        ignore_words_cased,
+        exclude_lines,
+        _,
+        word_regex,
+        ignore_word_regex,
+        uri_regex,
+        uri_ignore_words,
+        context,
+        options,
+        word_verdicts,
+    ) = check_args
+    bad_count = 0
+    changed = False
+    changes_made: list[tuple[int, str, str]] = []
 
-                if (not context_shown) and (context is not None):
-                    print_context(lines, i, context)
-                if filename != "-":
-                    print(
-                        f"{cfilename}:{cline}: {cwrongword} ==> {crightword}{creason}"
-                    )
-                elif options.stdin_single_line:
-                    print(f"{cline}: {cwrongword} ==> {crightword}{creason}")
-                else:
-                    print(
-                        f"{cline}: {line.strip()}\n\t{cwrongword} "
-                        f"==> {crightword}{creason}"
-                    )
+    _, fragment_line_number, lines = fragment
 
-    return bad_count, changed, changes_made
+    current_i = -1
+    fixed_words: set[str] = set()
+    # fixes to the line, applied at once after checking all its words
+    line_fixes: dict[str, str] = {}
+    asked_for: set[str] = set()
+
+    for i, line, match, lword, misspelling, fixword in _iter_misspellings(
+        lines,
+        check_lines,
+        misspellings,
+        ignore_words_cased,
+        exclude_lines,
+        word_regex,
+        ignore_word_regex,
+        uri_regex,
+        uri_ignore_words,
+        options,
+        word_verdicts,
+    ):
+        if i != current_i:
+            if line_fixes:
+                lines[current_i] = _replace_words(lines[current_i], line_fixes)
+                line_fixes.clear()
+            fixed_words.clear()
+            asked_for.clear()
+            current_i = i
+        line_number = fragment_line_number + i
+        word = match.group()
+        _count("dictionary_hits")
+
+        context_shown = False
+        fix = misspelling.fix
+
+        if options.interactive and lword not in asked_for:
+            # show the line as fixed so far
+            lines[i] = _replace_words(lines[i], line_fixes)
+            line_fixes.clear()
+            if context is not None:
+                context_shown = True
+                print_context(lines, i, context)
+            fix, fixword = ask_for_word_fix(
+                lines[i],
+                match,
+                misspelling,
+                options.interactive,
+                colors=colors,
+                filename=filename,
+                lineno=i + 1,
+            )
+            asked_for.add(lword)
 
+        if summary and fix:
+            summary.update(lword)
 
-def parse_file(
-    filename: str,
-    colors: TermColors,
-    summary: Optional[Summary],
-    misspellings: dict[str, Misspelling],
-    ignore_words_cased: set[str],
-    exclude_lines: set[str],
-    file_opener: FileOpener,
-    word_regex: Pattern[str],
-    ignore_word_regex: Optional[Pattern[str]],
-    uri_regex: Pattern[str],
-    uri_ignore_words: set[str],
-    context: Optional[tuple[int, int]],
-    options: argparse.Namespace,
-) -> int:
-    bad_count = 0
-    fragments = None
+        if word in fixed_words:  # all its occurrences get fixed
+            continue
 
-    # Read lines.
-    if filename == "-":
-        f = sys.stdin
-        encoding = "utf-8"
-        fragments = file_opener.get_lines(f)
-    else:
-        if options.check_filenames:
-            for word in extract_words(filename, word_regex, ignore_word_regex):
-                if word in ignore_words_cased:
-                    continue
-                lword = word.lower()
-                if lword not in misspellings:
-                    continue
-                fix = misspellings[lword].fix
-                fixword = fix_case(word, misspellings[lword].data)
+        # A word not found in the original line (e.g. --ignore-regex split
+        # it out of a larger word) is reported instead (GH-2056).
+        if (
+            options.write_changes
+            and fix
+            and next(_word_occurrences(lines[i], word), None) is not None
+        ):
+            changed = True
+            line_fixes[word] = fixword
+            fixed_words.add(word)
+            changes_made.append((line_number + 1, word, fixword))
+            continue
 
-                if summary and fix:
-                    summary.update(lword)
+        # otherwise warning was explicitly set by interactive mode
+        if options.interactive & 2 and not fix and not misspelling.reason:
+            continue
 
-                cfilename, _, cwrongword, crightword = _format_colored_output(
-                    filename, colors, 0, word, fixword
-                )
+        reason = misspelling.reason
+        if reason:
+            if options.quiet_level & QuietLevels.DISABLED_FIXES:
+                continue
+        elif options.quiet_level & QuietLevels.NON_AUTOMATIC_FIXES:
+            continue
 
-                reason = misspellings[lword].reason
-                if reason:
-                    if options.quiet_level & QuietLevels.DISABLED_FIXES:
-                        continue
-                    creason = f"  | {colors.FILE}{reason}{colors.DISABLE}"
-                else:
-                    if options.quiet_level & QuietLevels.NON_AUTOMATIC_FIXES:
-                        continue
-                    creason = ""
+        # If we get to this point (uncorrected error) we should change
+        # our bad_count and thus return value
+        bad_count += 1
+
+        if options.format == "text" and not context_shown and context is not None:
+            lines[i] = _replace_words(lines[i], line_fixes)
+            line_fixes.clear()
+            print_context(lines, i, context)
+        if options.format != "text" or filename != "-":
+            finding = Finding(
+                line_number + 1, match.start() + 1, word, fixword, reason, fix
+            )
+            _print_finding(filename, finding, colors, options.format)
+            continue
 
-                bad_count += 1
+        _, cline, cwrongword, crightword = _format_colored_output(
+            filename, colors, line_number + 1, word, fixword
+        )
+        creason = f"  | {colors.FILE}{reason}{colors.DISABLE}" if reason else ""
+        if options.stdin_single_line:
+            print(f"{cline}: {cwrongword} ==> {crightword}{creason}")
+        else:
+            print(f"{cline}: {line.strip()}\n\t{cwrongword} ==> {crightword}{creason}")
 
-                print(f"{cfilename}: {cwrongword} ==> {crightword}{creason}")
+    if line_fixes:
+        lines[current_i] = _replace_words(lines[current_i], line_fixes)
 
-        # ignore irregular files
-        if not os.path.isfile(filename):
-            return bad_count
+    return bad_count, changed, changes_made
 
-        try:
-            text = is_text_file(filename)
-        except PermissionError as e:
-            print(f"WARNING: {e.strerror}: {filename}", file=sys.stderr)
-            return bad_count
-        except OSError:
-            return bad_count
 
-        if not text:
-            if not options.quiet_level & QuietLevels.BINARY_FILE:
-                print(f"WARNING: Binary file: {filename}", file=sys.stderr)
-            return bad_count
-        try:
-            fragments, encoding = file_opener.open(filename)
-        except OSError:
-            return bad_count
+# Read-only checks stream files larger than this many bytes, in windows of
+# about as many characters, so that memory use does not grow with file size.
+_STREAM_CHUNK_SIZE = 1 << 20
 
-    # Parse lines.
-    changed = False
-    changes_made: list[tuple[int, str, str]] = []
-    for fragment in fragments:
-        ignore, _, _ = fragment
-        if ignore:
-            continue
 
-        bad_count_update, changed_update, changes_made_update = parse_lines(
-            fragment,
-            filename,
-            colors,
-            summary,
-            misspellings,
-            ignore_words_cased,
-            exclude_lines,
-            word_regex,
-            ignore_word_regex,
-            uri_regex,
-            uri_ignore_words,
-            context,
-            options,
+def _iter_line_windows(
+    f: Iterable[str],
+    before: int,
+    after: int,
+) -> Iterator[tuple[int, list[str], range]]:
+    """Read lines lazily and yield them in windows.
+
+    Each window is the index of its first line, its lines and the range
+    of the lines to check in it. Around these, it repeats up to before
+    lines of the previous window and holds up to after lines of the next
+    one.
+    """
+    history: collections.deque[str] = collections.deque(maxlen=before)
+    pending: list[str] = []
+    pending_size = 0
+    line_number = 0
+    for line in f:
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= _STREAM_CHUNK_SIZE and len(pending) > after:
+            count = len(pending) - after
+            yield (
+                line_number - len(history),
+                [*history, *pending],
+                range(len(history), len(history) + count),
+            )
+            history.extend(pending[:count])
+            line_number += count
+            pending = pending[count:]
+            pending_size = sum(map(len, pending))
+    if pending:
+        yield (
+            line_number - len(history),
+            [*history, *pending],
+            range(len(history), len(history) + len(pending)),
         )
-        bad_count += bad_count_update
-        changed = changed or changed_update
-        changes_made.extend(changes_made_update)
 
-    # Write out lines, if changed.
-    if changed:
+
+def _parse_stream(f: Iterable[str], filename: str, check_args: CheckArgs) -> int:
+    """Check lines read lazily, keeping only a window of them in memory."""
+    misspellings = check_args.misspellings
+    ignore_words_cased = check_args.ignore_words_cased
+    word_regex = check_args.word_regex
+    ignore_word_regex = check_args.ignore_word_regex
+    uri_ignore_words = check_args.uri_ignore_words
+    context = check_args.context
+    bad_count = 0
+    before, after = context if context is not None else (0, 0)
+    exact = _tokenizes_exactly(word_regex, ignore_word_regex, uri_ignore_words)
+    # the previous line is needed for ignore-next-line directives
+    for line_number, lines, check_range in _iter_line_windows(f, max(before, 1), after):
+        check_lines: Sequence[int] = check_range
+        if exact:
+            checked = lines[check_range.start : check_range.stop]
+            candidate_words = _candidate_words(
+                "".join(checked), misspellings, ignore_words_cased, word_regex
+            )
+            if not candidate_words:
+                continue
+            check_lines = [
+                check_range.start + i
+                for i in _candidate_lines(checked, candidate_words, word_regex)
+            ]
+        bad_count += parse_lines(
+            (False, line_number, lines), filename, check_args, check_lines=check_lines
+        )[0]
+    return bad_count
+
+
+def _iter_decoded_lines(f: BinaryIO, encoding: str) -> Iterator[str]:
+    """Decode the lines of a binary file lazily, leaving the file open."""
+    text = io.TextIOWrapper(f, encoding=encoding, newline="")
+    try:
+        yield from text
+    finally:
+        text.detach()
+
+
+def _check_decodes(f: BinaryIO, encoding: str) -> None:
+    """Decode a binary file in chunks, raising UnicodeDecodeError if it fails.
+
+    This is much quicker than checking the file, which is so done once
+    with the right encoding. The file is rewound.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        for chunk in iter(lambda: f.read(_STREAM_CHUNK_SIZE), b""):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    finally:
+        f.seek(0)
+
+
+def _parse_file_streaming(f: BinaryIO, filename: str, check_args: CheckArgs) -> int:
+    """Check a file with _parse_stream(), decoding it like FileOpener.decode().
+
+    The encoding is settled before any of the file is checked, so that it
+    is checked once, and errors come before any misspelling is reported.
+    """
+    file_opener = check_args.file_opener
+    if file_opener.use_chardet:
+        encoding = file_opener.detect_encoding(f)
+        f.seek(0)
+        try:
+            _check_decodes(f, encoding)
+        except UnicodeDecodeError:
+            _print_file_warning("ERROR: Could not detect encoding", filename)
+            raise
+        except LookupError:
+            _print_file_warning(
+                f"ERROR: Don't know how to handle encoding {encoding}", filename
+            )
+            raise
+    else:
+        encoding = "utf-8"
+        try:
+            _check_decodes(f, encoding)
+        except UnicodeDecodeError:
+            if not file_opener.quiet_level & QuietLevels.ENCODING:
+                _print_file_warning(
+                    f'WARNING: Cannot decode file using encoding "{encoding}"',
+                    filename,
+                )
+                print('WARNING: Trying next encoding "iso-8859-1"', file=sys.stderr)
+            encoding = "iso-8859-1"
+
+    lines = _iter_decoded_lines(f, encoding)
+    return _parse_stream(lines, filename, check_args)
+
+
+def _check_filename(filename: str, check_args: CheckArgs) -> int:
+    """Check the words of a file name, printing its misspellings."""
+    colors = check_args.colors
+    summary = check_args.summary
+    misspellings = check_args.misspellings
+    options = check_args.options
+    bad_count = 0
+    for match in extract_words_iter(
+        filename, check_args.word_regex, check_args.ignore_word_regex
+    ):
+        word = match.group()
+        if word in check_args.ignore_words_cased:
+            continue
+        lword = word.lower()
+        if lword not in misspellings:
+            continue
+        fix = misspellings[lword].fix
+        fixword = fix_case(word, misspellings[lword].data)
+
+        if summary and fix:
+            summary.update(lword)
+
+        reason = misspellings[lword].reason
+        if reason:
+            if options.quiet_level & QuietLevels.DISABLED_FIXES:
+                continue
+        elif options.quiet_level & QuietLevels.NON_AUTOMATIC_FIXES:
+            continue
+
+        bad_count += 1
+
+        if options.format != "text":
+            finding = Finding(0, match.start() + 1, word, fixword, reason, fix)
+            sys.stdout.write(format_finding(filename, finding, options.format) + "\n")
+            continue
+
+        cfilename, _, cwrongword, crightword = _format_colored_output(
+            filename, colors, 0, word, fixword
+        )
+        creason = f"  | {colors.FILE}{reason}{colors.DISABLE}" if reason else ""
+
+        print(f"{cfilename}: {cwrongword} ==> {crightword}{creason}")
+
+    return bad_count
+
+
+def parse_file(
+    filename: str,
+    check_args: CheckArgs,
+    *,
+    patch: Optional[FilePatch] = None,
+    entry: Optional[os.DirEntry[str]] = None,
+    data: Optional[bytes] = None,
+) -> int:
+    """Check a file, or only the lines added to it by patch.
+
+    entry is the directory entry of the file when it was found by walking
+    a directory, so that what is known about the file is not asked again.
+    data is the content of the file, when it was already read.
+    """
+    (
+        colors,
+        _,
+        misspellings,
+        ignore_words_cased,
+        _,
+        file_opener,
+        word_regex,
+        ignore_word_regex,
+        _,
+        uri_ignore_words,
+        _,
+        options,
+        _,
+    ) = check_args
+    bad_count = 0
+    fragments = None
+    candidate_words = None
+
+    # Read-only checks without multiline ignores need few lines at a time.
+    stream = not options.write_changes and file_opener.ignore_multiline_regex is None
+
+    # Read lines.
+    if filename == "-":
+        f = sys.stdin
+        encoding = "utf-8"
+        if stream:
+            return _parse_stream(f, filename, check_args)
+        fragments = file_opener.get_lines(f)
+    else:
+        _enter_phase("check")
+        # the name of a patched file is only new when the file is
+        if options.check_filenames and (patch is None or patch.new_file):
+            bad_count += _check_filename(filename, check_args)
+
+        _enter_phase("read")
+        if patch is not None:
+            fragments = _read_patched_file(filename, patch, file_opener)
+        else:
+            # ignore irregular files
+            try:
+                if entry is not None and not entry.is_file():
+                    return bad_count
+                st = os.stat(filename) if entry is None else entry.stat()
+            except OSError:
+                return bad_count
+            if not stat.S_ISREG(st.st_mode):
+                return bad_count
+
+            # Each file is read once, and checked from memory unless streamed.
+            streamed = stream and st.st_size > _STREAM_CHUNK_SIZE
+            try:
+                with open(filename, "rb") if data is None else io.BytesIO(data) as f:
+                    data = f.read(1024) if streamed else f.read()
+                    if not is_text(data):
+                        _count("skipped_binary")
+                        if not options.quiet_level & QuietLevels.BINARY_FILE:
+                            _print_file_warning("WARNING: Binary file", filename)
+                        return bad_count
+                    _count("bytes_read", st.st_size if streamed else len(data))
+                    if streamed:
+                        f.seek(0)
+                        _enter_phase("check")
+                        return bad_count + _parse_file_streaming(
+                            f, filename, check_args
+                        )
+            except PermissionError as e:
+                _print_file_warning(f"WARNING: {e.strerror}", filename)
+                return bad_count
+            except OSError:
+                return bad_count
+
+            # Most files are pure ASCII, which needs no Unicode character
+            # classes to be split into words and can be searched undecoded.
+            _enter_phase("check")
+            if (
+                not file_opener.use_chardet
+                and word_regex.pattern == word_regex_def
+                and data.isascii()
+            ):
+                word_regex = _ascii_word_regex
+                check_args = check_args._replace(word_regex=word_regex)
+                if file_opener.ignore_multiline_regex is None and _tokenizes_exactly(
+                    word_regex, ignore_word_regex, uri_ignore_words
+                ):
+                    candidate_words = _candidate_words(
+                        data.decode("ascii"),
+                        misspellings,
+                        ignore_words_cased,
+                        word_regex,
+                    )
+                    if not candidate_words:
+                        return bad_count
+            _enter_phase("read")
+            fragments, encoding = file_opener.decode(data, filename)
+        _enter_phase("check")
+
+    # Most files have no misspelling at all, which the distinct words of the
+    # whole file tell quickly. Otherwise only lines with those words are checked.
+    # The added lines of a patch are few, and checked directly.
+    added_lines = None
+    if patch is not None:
+        added_lines = sorted(set(patch.added))
+    elif candidate_words is None and _tokenizes_exactly(
+        word_regex, ignore_word_regex, uri_ignore_words
+    ):
+        text = "".join(
+            line for ignore, _, lines in fragments if not ignore for line in lines
+        )
+        candidate_words = _candidate_words(
+            text,
+            misspellings,
+            ignore_words_cased,
+            word_regex,
+        )
+        if not candidate_words:
+            return bad_count
+
+    # Parse lines.
+    changed = False
+    changes_made: list[tuple[int, str, str]] = []
+    for fragment in fragments:
+        ignore, fragment_line_number, lines = fragment
+        if ignore:
+            continue
+        if added_lines is not None:
+            check_lines: Optional[list[int]] = [
+                line_number - fragment_line_number - 1
+                for line_number in added_lines
+                if 0 < line_number - fragment_line_number <= len(lines)
+            ]
+        elif candidate_words is not None:
+            check_lines = _candidate_lines(lines, candidate_words, word_regex)
+        else:
+            check_lines = None
+
+        bad_count_update, changed_update, changes_made_update = parse_lines(
+            fragment, filename, check_args, check_lines=check_lines
+        )
+        bad_count += bad_count_update
+        changed = changed or changed_update
+        changes_made.extend(changes_made_update)
+
+    # Write out lines, if changed.
+    if changed:
+        _enter_phase("write")
+        _count("fixes_written", len(changes_made))
         if filename == "-":
             print("---")
             for _, _, lines in fragments:
@@ -1278,6 +2073,451 @@ def parse_file(
     return bad_count
 
 
+def _read_patched_file(
+    filename: str,
+    patch: FilePatch,
+    file_opener: FileOpener,
+) -> list[tuple[bool, int, list[str]]]:
+    """Read the new version of a file changed by a patch.
+
+    The file is read from disk when it agrees with the lines in the patch,
+    so that directives outside of the hunks apply. Otherwise only the lines
+    in the patch are known, and the others are left empty.
+    """
+    if os.path.isfile(filename):
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+            if is_text(data):
+                fragments, _ = file_opener.decode(data, filename)
+                text = "".join(line for _, _, lines in fragments for line in lines)
+                if patch.matches(io.StringIO(text, newline="").readlines()):
+                    return fragments
+        except (OSError, UnicodeDecodeError, LookupError):
+            pass
+    return file_opener.get_lines(io.StringIO(patch.text(), newline=""))
+
+
+def _iter_listed_files(
+    directory: str,
+    paths: Iterable[str],
+    glob_match: GlobMatch,
+    check_hidden: bool,
+) -> Iterator[str]:
+    """Yield the listed files below directory that os.walk() would check."""
+    skipped_dirs: dict[str, bool] = {}
+
+    def is_skipped_dir(path: str) -> bool:
+        if path not in skipped_dirs:
+            parent, name = os.path.split(path)
+            if not name:
+                skipped = glob_match.match_dir(directory)
+            else:
+                skipped = (
+                    is_skipped_dir(parent)
+                    or glob_match.match_dir(name)
+                    or is_hidden(name, check_hidden)
+                    or glob_match.match_dir(os.path.join(directory, path))
+                )
+            skipped_dirs[path] = skipped
+        return skipped_dirs[path]
+
+    for path in paths:
+        parent, file_ = os.path.split(path)
+        if is_skipped_dir(parent):
+            continue
+        # ignore hidden files in directories
+        if is_hidden(file_, check_hidden):
+            _count("skipped_hidden")
+            continue
+        fname = os.path.join(directory, path)
+        # skip files, and paths
+        if glob_match.match(file_) or glob_match.match(fname):
+            _count("skipped_glob")
+            continue
+        yield fname
+
+
+def _paths_below(directory: str, paths: Iterable[str]) -> list[str]:
+    """Return the sorted paths below directory, relative to it."""
+    below = []
+    for path in paths:
+        relpath = os.path.relpath(path, directory)
+        if relpath != os.pardir and not relpath.startswith(os.pardir + os.sep):
+            below.append(relpath)
+    return sorted(below)
+
+
+def _walk_files(
+    top: str,
+    glob_match: GlobMatch,
+    check_hidden: bool,
+) -> Iterator[os.DirEntry[str]]:
+    """Yield the entries of the files to check below top.
+
+    Directories are walked as os.walk() walks them, top-down without
+    following symbolic links, but the entries of files are kept so that
+    what scandir() told about them is reused.
+    """
+    if glob_match.match_dir(top):  # skip (absolute) directories
+        return
+    stack = [top]
+    while stack:
+        root = stack.pop()
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        dirs: list[os.DirEntry[str]] = []
+        files: list[os.DirEntry[str]] = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            (dirs if is_dir else files).append(entry)
+
+        # a hidden directory has all its subdirectories walked, see os.walk()
+        root_hidden = is_hidden(root, check_hidden)
+        if not root_hidden:
+            files.sort(key=lambda entry: entry.name)
+            for entry in files:
+                # ignore hidden files in directories
+                if is_hidden(entry.name, check_hidden):
+                    _count("skipped_hidden")
+                    continue
+                # skip files, and paths
+                if glob_match.match(entry.name) or glob_match.match(entry.path):
+                    _count("skipped_glob")
+                    continue
+                yield entry
+
+        subdirs = []
+        for entry in dirs:
+            try:
+                if entry.is_symlink():
+                    continue
+            except OSError:
+                pass
+            # skip (relative) directories, and those that would be skipped
+            # as absolute ones, without walking them
+            if not root_hidden and is_hidden(entry.name, check_hidden):
+                _count("skipped_hidden")
+                continue
+            if (
+                not root_hidden and glob_match.match_dir(entry.name)
+            ) or glob_match.match_dir(entry.path):
+                _count("skipped_glob")
+                continue
+            subdirs.append(entry.path)
+        stack.extend(reversed(subdirs))
+
+
+# Size of the reads of --files-from, which returns what is available sooner.
+_READ_PATHS_SIZE = 1 << 16
+
+
+def _read_paths(f: BinaryIO) -> Iterator[str]:
+    """Yield the paths listed in f as they are read.
+
+    Paths are separated by NUL characters if there are any by the end of
+    the first path, else by line endings. Empty paths are ignored.
+    """
+    # unlike read(), read1() does not wait for a pipe to fill the buffer
+    read = getattr(f, "read1", f.read)
+    separator = None
+    rest = b""
+    for chunk in iter(lambda: read(_READ_PATHS_SIZE), b""):
+        rest += chunk
+        if separator is None:
+            if b"\0" in rest:
+                separator = b"\0"
+            elif b"\n" in rest:
+                separator = b"\n"
+            else:
+                continue
+        paths = rest.split(separator)
+        rest = paths.pop()
+        yield from _decode_paths(paths, separator)
+    yield from _decode_paths([rest], separator or b"\n")
+
+
+def _decode_paths(paths: list[bytes], separator: bytes) -> Iterator[str]:
+    for path in paths:
+        name = path[:-1] if separator == b"\n" and path.endswith(b"\r") else path
+        if name:
+            yield os.fsdecode(name)
+
+
+def _iter_files(
+    files: Iterable[str],
+    glob_match: GlobMatch,
+    check_hidden: bool,
+    listed_files: Optional[Mapping[str, list[str]]] = None,
+) -> Iterator[tuple[str, Optional[os.DirEntry[str]]]]:
+    """Yield the files to check, in the order they are reported.
+
+    Files are yielded with their directory entry when found by walking a
+    directory. Directories in listed_files are not walked, only the files
+    listed for them, e.g. by git, are checked.
+    """
+    for filename in files:
+        # ignore hidden files
+        if is_hidden(filename, check_hidden):
+            _count("skipped_hidden")
+            continue
+
+        if listed_files is not None and filename in listed_files:
+            for fname in _iter_listed_files(
+                filename, listed_files[filename], glob_match, check_hidden
+            ):
+                yield fname, None
+        elif os.path.isdir(filename):
+            for entry in _walk_files(filename, glob_match, check_hidden):
+                yield entry.path, entry
+        elif glob_match.match(filename):  # skip files
+            _count("skipped_glob")
+        else:
+            yield filename, None
+
+
+class _FileOutputCapture(io.TextIOBase):
+    """Text stream capturing the output about a file.
+
+    Findings and warnings are added as lists of their fields and message,
+    apart from the name of the file, so that they can be reported under
+    the name of another file with the same content.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._output: FileOutput = []
+        self._text: list[str] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._text.append(text)
+        return len(text)
+
+    def _end_text(self) -> None:
+        if self._text:
+            self._output.append("".join(self._text))
+            self._text.clear()
+
+    def add(self, fields: list[Any]) -> None:
+        self._end_text()
+        self._output.append(fields)
+
+    def getvalue(self) -> FileOutput:
+        self._end_text()
+        return self._output
+
+
+def _parse_file_captured(
+    filename: str,
+    check_args: CheckArgs,
+    entry: Optional[os.DirEntry[str]] = None,
+    data: Optional[bytes] = None,
+) -> FileResult:
+    """Run parse_file(), returning its output instead of printing it."""
+    summary = Summary()
+    stdout, stderr = _FileOutputCapture(), _FileOutputCapture()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        bad_count = parse_file(
+            filename, check_args._replace(summary=summary), entry=entry, data=data
+        )
+    return bad_count, stdout.getvalue(), stderr.getvalue(), summary.summary
+
+
+def _check_file(
+    filename: str,
+    check_args: CheckArgs,
+    results_cache: Optional[ResultsCache],
+    entry: Optional[os.DirEntry[str]] = None,
+    data: Optional[bytes] = None,
+    digest: Optional[str] = None,
+) -> FileResult:
+    if results_cache is None:
+        return _parse_file_captured(filename, check_args, entry, data)
+    st = None
+    if entry is not None:
+        with contextlib.suppress(OSError):
+            st = entry.stat()
+    return results_cache.fetch(
+        filename,
+        lambda: _parse_file_captured(filename, check_args, entry, data),
+        st,
+        digest,
+    )
+
+
+def _unique_files(
+    filenames: Iterable[tuple[str, Optional[os.DirEntry[str]]]],
+) -> Iterator[tuple[str, Optional[os.DirEntry[str]]]]:
+    """Leave out the files already yielded under another path.
+
+    Hard links to a file and symbolic links to it or to a directory above
+    it are the same file, found by its device and inode numbers.
+    """
+    seen: set[tuple[int, int]] = set()
+    for filename, entry in filenames:
+        if filename != "-":
+            try:
+                st = os.stat(filename) if entry is None else entry.stat()
+            except OSError:
+                pass
+            else:
+                # some file systems have no inode numbers
+                if st.st_ino:
+                    key = (st.st_dev, st.st_ino)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+        yield filename, entry
+
+
+def _read_for_digest(filename: str, size: int) -> tuple[str, Optional[bytes]]:
+    """Return the file_digest() of a file, and its content unless streamed.
+
+    Large files are hashed in chunks instead of being read at once.
+    """
+    with open(filename, "rb") as f:
+        if size > _STREAM_CHUNK_SIZE:
+            return file_digest(f), None
+        data = f.read()
+    return file_digest(io.BytesIO(data)), data
+
+
+def _parse_files_dedup(
+    filenames: Iterable[tuple[str, Optional[os.DirEntry[str]]]],
+    check_args: CheckArgs,
+    results_cache: Optional[ResultsCache],
+    check_filenames: bool,
+) -> int:
+    """Check files, checking the content of identical files only once.
+
+    The result of the first file with some content is reported again for
+    the other files with the same content, under their name. Files are only
+    hashed once another file has the same size. File names are checked
+    apart, as the check of the content does not.
+    """
+    # the first file of each size, until another file has that size
+    unhashed: dict[int, tuple[str, FileResult]] = {}
+    hashed_sizes: set[int] = set()
+    checked: dict[tuple[int, str], FileResult] = {}
+    bad_count = 0
+    for filename, entry in filenames:
+        if filename == "-":
+            bad_count += parse_file(filename, check_args)
+            continue
+        if check_filenames:
+            bad_count += _check_filename(filename, check_args)
+        size = key = digest = data = None
+        try:
+            st = os.stat(filename) if entry is None else entry.stat()
+            if stat.S_ISREG(st.st_mode):
+                size = st.st_size
+                if size in unhashed:
+                    hashed_sizes.add(size)
+                    first, first_result = unhashed.pop(size)
+                    checked[size, _read_for_digest(first, size)[0]] = first_result
+                if size in hashed_sizes:
+                    # the content is checked from what was read for hashing it
+                    digest, data = _read_for_digest(filename, size)
+                    key = (size, digest)
+        except OSError:
+            pass
+        result = checked.get(key) if key is not None else None
+        if result is None:
+            result = _check_file(
+                filename, check_args, results_cache, entry, data, digest
+            )
+            if key is not None:
+                checked[key] = result
+            elif size is not None:
+                unhashed[size] = filename, result
+        bad_count += _print_file_result(result, filename, check_args)
+    return bad_count
+
+
+def _print_file_result(result: FileResult, filename: str, check_args: CheckArgs) -> int:
+    """Print the result of checking a file, reported under filename."""
+    _enter_phase("output")
+    bad_count, stdout, stderr, summary_counts = result
+    colors, output_format = check_args.colors, check_args.options.format
+    for part in stdout:
+        if isinstance(part, str):
+            sys.stdout.write(part)
+        else:
+            finding = Finding(*part)
+            line = _format_file_finding(filename, finding, colors, output_format)
+            sys.stdout.write(line + "\n")
+    for part in stderr:
+        sys.stderr.write(part if isinstance(part, str) else f"{part[0]}: {filename}\n")
+    if check_args.summary is not None:
+        check_args.summary.merge(summary_counts)
+    return bad_count
+
+
+# Number of files handed to a worker process at once with --jobs.
+_JOBS_CHUNKSIZE = 16
+# Arguments of parse_file() after the file name and the results cache, set in
+# each worker process.
+_worker_check_args: CheckArgs
+_worker_results_cache: Optional[ResultsCache] = None
+
+
+def _init_worker(check_args: CheckArgs, results_cache: Optional[ResultsCache]) -> None:
+    global _worker_check_args, _worker_results_cache  # noqa: PLW0603
+    _worker_check_args = check_args
+    _worker_results_cache = results_cache
+
+
+def _worker_check_file(filename: str) -> Optional[tuple[str, FileResult, int]]:
+    """Check a file in a worker, also returning the cache entries written."""
+    if filename == "-":
+        return None  # stdin belongs to the main process
+    if _worker_results_cache is None:
+        return filename, _check_file(filename, _worker_check_args, None), 0
+    stored = _worker_results_cache.stored
+    result = _check_file(filename, _worker_check_args, _worker_results_cache)
+    return filename, result, _worker_results_cache.stored - stored
+
+
+def _parse_files_parallel(
+    filenames: Iterable[str],
+    jobs: int,
+    check_args: CheckArgs,
+    results_cache: Optional[ResultsCache],
+) -> int:
+    """Check files in a pool of processes, printing results in order."""
+    # imported here, as it takes long and most runs use a single process
+    import multiprocessing
+
+    bad_count = 0
+    # With the default "fork" start method on Unix the dictionaries are
+    # inherited by the workers instead of being pickled.
+    with multiprocessing.Pool(
+        jobs or None,
+        initializer=_init_worker,
+        initargs=(check_args, results_cache),
+    ) as pool:
+        for worker_result in pool.imap(
+            _worker_check_file, filenames, chunksize=_JOBS_CHUNKSIZE
+        ):
+            if worker_result is None:
+                bad_count += parse_file("-", check_args)
+                continue
+            filename, result, stored = worker_result
+            if results_cache is not None:
+                results_cache.stored += stored
+            bad_count += _print_file_result(result, filename, check_args)
+    return bad_count
+
+
 def flatten_clean_comma_separated_arguments(
     arguments: Iterable[str],
 ) -> list[str]:
@@ -1329,158 +2569,575 @@ def _select_builtin_dictionary(builtin_option: str) -> list[str]:
     return use_dictionaries
 
 
-def main(*args: str) -> int:
-    """Contains flow control"""
-    try:
-        options, parser, used_cfg_files = parse_options(args)
-    except configparser.Error as e:
-        print(
-            f"ERROR: ill-formed config file: {e.message}",
-            file=sys.stderr,
-        )
-        return EX_CONFIG
+# Dictionaries kept in memory across calls to main() by long-running
+# processes, e.g. the daemon, keyed by their dictionary cache key.
+_dictionaries_memo: Optional[dict[str, Mapping[str, Misspelling]]] = None
+_DICTIONARIES_MEMO_SIZE = 8
 
-    # Report used config files
-    if not options.quiet_level & QuietLevels.CONFIG_FILES:
-        if len(used_cfg_files) > 0:
-            print("Used config files:")
-        for ifile, cfg_file in enumerate(used_cfg_files, start=1):
-            print(f"    {ifile}: {cfg_file}")
 
-    if options.interactive > 0:
-        options.write_changes = True
+def _load_dictionaries(
+    use_dictionaries: list[str],
+    ignore_words: set[str],
+    cache_dir: Optional[str],
+    memoize: bool,
+) -> Mapping[str, Misspelling]:
+    key = None
+    if memoize and _dictionaries_memo is not None:
+        key = _dict_cache_key(use_dictionaries, ignore_words)
+        if key in _dictionaries_memo:
+            return _dictionaries_memo[key]
 
-    if options.regex and options.write_changes:
-        return _usage_error(
-            parser,
-            "ERROR: --write-changes cannot be used together with --regex",
-        )
-    word_regex = options.regex or word_regex_def
-    try:
-        word_regex = re.compile(word_regex)
-    except re.error as e:
-        return _usage_error(
-            parser,
-            f'ERROR: invalid --regex "{word_regex}" ({e})',
-        )
+    misspellings: Mapping[str, Misspelling]
+    if cache_dir:
+        misspellings = build_dict_cached(use_dictionaries, ignore_words, cache_dir)
+    else:
+        built = Misspellings()
+        for dictionary in use_dictionaries:
+            build_dict(dictionary, built, ignore_words)
+        built.compact()
+        misspellings = built
+
+    if key is not None and _dictionaries_memo is not None:
+        if len(_dictionaries_memo) >= _DICTIONARIES_MEMO_SIZE:
+            del _dictionaries_memo[next(iter(_dictionaries_memo))]
+        _dictionaries_memo[key] = misspellings
+    return misspellings
+
+
+# Number of characters of the texts given to Spellchecker.check_records()
+# whose words are looked up at once.
+_BATCH_SIZE = 1 << 16
+_RecordId = TypeVar("_RecordId")
+
+
+def _iter_batches(
+    records: Iterable[tuple[_RecordId, str]],
+) -> Iterator[list[tuple[_RecordId, str]]]:
+    """Group records in lists of about _BATCH_SIZE characters of text."""
+    batch: list[tuple[_RecordId, str]] = []
+    batch_size = 0
+    for record in records:
+        batch.append(record)
+        batch_size += len(record[1])
+        if batch_size >= _BATCH_SIZE:
+            yield batch
+            batch = []
+            batch_size = 0
+    if batch:
+        yield batch
+
+
+class Spellchecker:
+    """Check text in process, returning the misspellings instead of printing.
+
+    It is created from the same arguments as main(), config files included,
+    and keeps the dictionaries and compiled regexes between checks. Like
+    for main(), setup.cfg, .codespellrc and pyproject.toml are read from the
+    current directory, and relative paths are resolved against it. Options
+    about files and output have no effect. ValueError is raised for invalid
+    options.
+    """
 
-    if options.ignore_regex:
+    def __init__(self, *args: str) -> None:
+        try:
+            options, _, _ = parse_options(args, exit_on_error=False)
+        except configparser.Error as e:
+            msg = f"ill-formed config file: {e.message}"
+            raise ValueError(msg) from e
+        self._configure(options)
+
+    @classmethod
+    def _from_options(cls, options: argparse.Namespace) -> "Spellchecker":
+        checker = cls.__new__(cls)
+        checker._configure(options)
+        return checker
+
+    def _configure(self, options: argparse.Namespace) -> None:
+        self.options = options
+        word_regex = options.regex or word_regex_def
         try:
-            ignore_word_regex = re.compile(options.ignore_regex)
+            self.word_regex = re.compile(word_regex)
         except re.error as e:
-            return _usage_error(
-                parser,
-                f'ERROR: invalid --ignore-regex "{options.ignore_regex}" ({e})',
+            msg = f'invalid --regex "{word_regex}" ({e})'
+            raise ValueError(msg) from e
+
+        self.ignore_word_regex = None
+        if options.ignore_regex:
+            try:
+                self.ignore_word_regex = re.compile(options.ignore_regex)
+            except re.error as e:
+                msg = f'invalid --ignore-regex "{options.ignore_regex}" ({e})'
+                raise ValueError(msg) from e
+
+        self.ignore_multiline_regex = None
+        if options.ignore_multiline_regex:
+            try:
+                self.ignore_multiline_regex = re.compile(
+                    options.ignore_multiline_regex, re.DOTALL
+                )
+            except re.error as e:
+                msg = (
+                    f"invalid --ignore-multiline-regex "
+                    f'"{options.ignore_multiline_regex}" ({e})'
+                )
+                raise ValueError(msg) from e
+
+        self.ignore_words, self.ignore_words_cased = parse_ignore_words_option(
+            options.ignore_words_list
+        )
+        if options.ignore_words:
+            ignore_words_files = flatten_clean_comma_separated_arguments(
+                options.ignore_words
             )
-    else:
-        ignore_word_regex = None
+            for ignore_words_file in ignore_words_files:
+                if not os.path.isfile(ignore_words_file):
+                    msg = f"cannot find ignore-words file: {ignore_words_file}"
+                    raise ValueError(msg)
+                build_ignore_words(
+                    ignore_words_file, self.ignore_words, self.ignore_words_cased
+                )
 
-    if options.ignore_multiline_regex:
+        uri_regex = options.uri_regex or uri_regex_def
         try:
-            ignore_multiline_regex = re.compile(
-                options.ignore_multiline_regex, re.DOTALL
-            )
+            self.uri_regex = re.compile(uri_regex)
         except re.error as e:
-            return _usage_error(
-                parser,
-                f"ERROR: invalid --ignore-multiline-regex "
-                f'"{options.ignore_multiline_regex}" ({e})',
-            )
-    else:
-        ignore_multiline_regex = None
+            msg = f'invalid --uri-regex "{uri_regex}" ({e})'
+            raise ValueError(msg) from e
 
-    ignore_words, ignore_words_cased = parse_ignore_words_option(
-        options.ignore_words_list
-    )
-    if options.ignore_words:
-        ignore_words_files = flatten_clean_comma_separated_arguments(
-            options.ignore_words
+        self.uri_ignore_words = set(
+            itertools.chain(*parse_ignore_words_option(options.uri_ignore_words_list))
         )
-        for ignore_words_file in ignore_words_files:
-            if not os.path.isfile(ignore_words_file):
-                return _usage_error(
-                    parser,
-                    f"ERROR: cannot find ignore-words file: {ignore_words_file}",
-                )
-            build_ignore_words(ignore_words_file, ignore_words, ignore_words_cased)
 
-    uri_regex = options.uri_regex or uri_regex_def
-    try:
-        uri_regex = re.compile(uri_regex)
-    except re.error as e:
-        return _usage_error(
-            parser,
-            f'ERROR: invalid --uri-regex "{uri_regex}" ({e})',
+        dictionaries = flatten_clean_comma_separated_arguments(
+            options.dictionary or ["-"]
         )
 
-    uri_ignore_words = set(
-        itertools.chain(*parse_ignore_words_option(options.uri_ignore_words_list))
-    )
+        self.use_dictionaries: list[str] = []
+        for dictionary in dictionaries:
+            if dictionary == "-":
+                try:
+                    self.use_dictionaries.extend(
+                        _select_builtin_dictionary(options.builtin)
+                    )
+                except KeyError as e:
+                    msg = f"Unknown builtin dictionary: {e.args[0]}"
+                    raise ValueError(msg) from e
+            else:
+                if not os.path.isfile(dictionary):
+                    msg = f"cannot find dictionary file: {dictionary}"
+                    raise ValueError(msg)
+                self.use_dictionaries.append(dictionary)
+        # Interactive mode edits the entries, so it does not share them.
+        self.misspellings = _load_dictionaries(
+            self.use_dictionaries,
+            self.ignore_words,
+            options.cache_dir,
+            memoize=not options.interactive,
+        )
+        self._word_verdicts = _WordVerdicts(self.misspellings, self.ignore_words_cased)
 
-    dictionaries = flatten_clean_comma_separated_arguments(options.dictionary or ["-"])
+        self.exclude_lines: set[str] = set()
+        if options.exclude_file:
+            exclude_files = flatten_clean_comma_separated_arguments(
+                options.exclude_file
+            )
+            for exclude_file in exclude_files:
+                build_exclude_hashes(exclude_file, self.exclude_lines)
 
-    use_dictionaries = []
-    for dictionary in dictionaries:
-        if dictionary == "-":
-            try:
-                use_dictionaries.extend(_select_builtin_dictionary(options.builtin))
-            except KeyError as e:
-                return _usage_error(
-                    parser,
-                    f"ERROR: Unknown builtin dictionary: {e.args[0]}",
+        self.file_opener = FileOpener(
+            options.hard_encoding_detection,
+            options.quiet_level,
+            self.ignore_multiline_regex,
+        )
+
+    def check_text(self, text: str) -> Iterator[Finding]:
+        """Yield the misspellings in text, in order.
+
+        Inline and next-line ignore directives, excluded lines and ignored
+        regexes apply as for files.
+        """
+        quiet_level = self.options.quiet_level
+        fragments = self.file_opener.get_lines(io.StringIO(text, newline=""))
+        for ignore, fragment_line_number, lines in fragments:
+            if ignore:
+                continue
+            for i, _, match, _, misspelling, fixword in _iter_misspellings(
+                lines,
+                None,
+                self.misspellings,
+                self.ignore_words_cased,
+                self.exclude_lines,
+                self.word_regex,
+                self.ignore_word_regex,
+                self.uri_regex,
+                self.uri_ignore_words,
+                self.options,
+                self._word_verdicts,
+            ):
+                reason = misspelling.reason
+                if reason:
+                    if quiet_level & QuietLevels.DISABLED_FIXES:
+                        continue
+                elif quiet_level & QuietLevels.NON_AUTOMATIC_FIXES:
+                    continue
+                yield Finding(
+                    fragment_line_number + i + 1,
+                    match.start() + 1,
+                    match.group(),
+                    fixword,
+                    reason,
+                    misspelling.fix,
                 )
-        else:
-            if not os.path.isfile(dictionary):
-                return _usage_error(
-                    parser,
-                    f"ERROR: cannot find dictionary file: {dictionary}",
+
+    def check_records(
+        self, records: Iterable[tuple[_RecordId, str]]
+    ) -> Iterator[tuple[_RecordId, Finding]]:
+        """Yield the misspellings in many texts, each with the id of its text.
+
+        records are (id, text) pairs, checked in order. They are read in
+        batches, and the distinct words of a batch are looked up at once, so
+        that only the texts with a possible misspelling are checked in full.
+        """
+        exact = _tokenizes_exactly(
+            self.word_regex, self.ignore_word_regex, self.uri_ignore_words
+        )
+        for batch in _iter_batches(records):
+            # a line ending after each text keeps words from spanning texts
+            texts = [text + "\n" for _, text in batch]
+            checked: Iterable[int] = range(len(batch))
+            if exact:
+                checked = _candidate_lines(
+                    texts,
+                    _candidate_words(
+                        "".join(texts),
+                        self.misspellings,
+                        self.ignore_words_cased,
+                        self.word_regex,
+                    ),
+                    self.word_regex,
                 )
-            use_dictionaries.append(dictionary)
-    misspellings: dict[str, Misspelling] = {}
-    for dictionary in use_dictionaries:
-        build_dict(dictionary, misspellings, ignore_words)
-    colors = TermColors()
-    if not options.colors:
-        colors.disable()
+            for i in checked:
+                record_id, text = batch[i]
+                for finding in self.check_text(text):
+                    yield record_id, finding
+
+
+def _visit_files(
+    filenames: Iterable[tuple[str, Optional[os.DirEntry[str]]]],
+) -> Iterator[tuple[str, Optional[os.DirEntry[str]]]]:
+    """Yield the files to check, timing the walk and counting them."""
+    iterator = iter(filenames)
+    while True:
+        _enter_phase("walk")
+        item = next(iterator, None)
+        if item is None:
+            return
+        _count("files_visited")
+        yield item
+
+
+def _parse_files(
+    filenames: Iterable[tuple[str, Optional[os.DirEntry[str]]]],
+    options: argparse.Namespace,
+    check_args: CheckArgs,
+    results_cache: Optional[ResultsCache],
+    patches: Optional[dict[str, FilePatch]],
+) -> int:
+    """Check files the way the options tell, returning the misspellings count."""
+    if options.dedup is not None:
+        filenames = _unique_files(filenames)
+    if patches is not None:
+        # Only the lines of the patches are checked, files not patched are not.
+        bad_count = 0
+        for filename, _ in filenames:
+            patch = patches.get(os.path.normpath(filename))
+            if patch is not None:
+                bad_count += parse_file(filename, check_args, patch=patch)
+        return bad_count
+    if options.jobs != 1:
+        # directory entries cannot be sent to the workers
+        return _parse_files_parallel(
+            (filename for filename, _ in filenames),
+            options.jobs,
+            check_args,
+            results_cache,
+        )
+    if options.dedup == "content":
+        return _parse_files_dedup(
+            filenames, check_args, results_cache, options.check_filenames
+        )
+    bad_count = 0
+    if results_cache is None:
+        for filename, entry in filenames:
+            bad_count += parse_file(filename, check_args, entry=entry)
+        return bad_count
+    for filename, entry in filenames:
+        if filename == "-":
+            bad_count += parse_file(filename, check_args)
+        else:
+            bad_count += _print_file_result(
+                _check_file(filename, check_args, results_cache, entry),
+                filename,
+                check_args,
+            )
+    return bad_count
+
+
+def _options_error(options: argparse.Namespace) -> Optional[str]:
+    """Return the error of options that cannot be used together, if any."""
+    context_given = (
+        options.context is not None
+        or options.before_context is not None
+        or options.after_context is not None
+    )
+    errors = (
+        (options.jobs < 0, "--jobs cannot be negative"),
+        (
+            options.jobs != 1 and options.interactive,
+            "--jobs cannot be used together with --interactive",
+        ),
+        (
+            options.regex and options.write_changes,
+            "--write-changes cannot be used together with --regex",
+        ),
+        (
+            options.changed_lines_only and options.changed_since is None,
+            "--changed-lines-only requires --changed-since",
+        ),
+        (
+            options.diff is not None and options.changed_since is not None,
+            "--diff cannot be used together with --changed-since",
+        ),
+        (
+            options.write_changes
+            and (options.diff is not None or options.changed_lines_only),
+            "--write-changes cannot be used together with --diff "
+            "or --changed-lines-only",
+        ),
+        (
+            options.files_from is not None
+            and (options.git_files or options.changed_since is not None),
+            "--files-from cannot be used together with --git-files or --changed-since",
+        ),
+        (
+            options.files_from == "-" and options.diff == "-",
+            "--files-from and --diff cannot both read stdin",
+        ),
+        (
+            options.dedup == "content"
+            and (
+                options.write_changes
+                or options.jobs != 1
+                or options.diff is not None
+                or options.changed_lines_only
+            ),
+            "--dedup=content cannot be used together with "
+            "--write-changes, --jobs, --diff or --changed-lines-only",
+        ),
+        (
+            options.format != "text"
+            and (options.interactive or options.summary or context_given),
+            f"--format={options.format} cannot be used together with "
+            "--interactive, --summary or context options",
+        ),
+        (
+            # the fixed text would be written among the findings
+            options.format != "text" and options.write_changes and "-" in options.files,
+            f"--format={options.format} cannot be used together with "
+            "--write-changes on stdin",
+        ),
+        (
+            options.stats and options.jobs != 1,
+            "--stats cannot be used together with --jobs",
+        ),
+        (
+            options.context is not None
+            and (
+                options.before_context is not None or options.after_context is not None
+            ),
+            "--context/-C cannot be used together with "
+            "--context-before/-B or --context-after/-A",
+        ),
+    )
+    for error, message in errors:
+        if error:
+            return f"ERROR: {message}"
+    return None
 
-    summary = Summary() if options.summary else None
 
-    context = None
+def _context_lines(options: argparse.Namespace) -> Optional[tuple[int, int]]:
+    """Return the numbers of lines of context before and after misspellings."""
     if options.context is not None:
-        if (options.before_context is not None) or (options.after_context is not None):
-            return _usage_error(
-                parser,
-                "ERROR: --context/-C cannot be used together with "
-                "--context-before/-B or --context-after/-A",
-            )
         context_both = max(0, options.context)
-        context = (context_both, context_both)
-    elif (options.before_context is not None) or (options.after_context is not None):
+        return (context_both, context_both)
+    if (options.before_context is not None) or (options.after_context is not None):
         context_before = 0
         context_after = 0
         if options.before_context is not None:
             context_before = max(0, options.before_context)
         if options.after_context is not None:
             context_after = max(0, options.after_context)
-        context = (context_before, context_after)
-
-    exclude_lines: set[str] = set()
-    if options.exclude_file:
-        exclude_files = flatten_clean_comma_separated_arguments(options.exclude_file)
-        for exclude_file in exclude_files:
-            build_exclude_hashes(exclude_file, exclude_lines)
-
-    file_opener = FileOpener(
-        options.hard_encoding_detection,
-        options.quiet_level,
-        ignore_multiline_regex,
-    )
+        return (context_before, context_after)
+    return None
 
-    glob_match = GlobMatch(
-        flatten_clean_comma_separated_arguments(options.skip) if options.skip else []
-    )
+
+def _read_patches(options: argparse.Namespace) -> Optional[dict[str, FilePatch]]:
+    """Return the files changed by a diff, by normalized path.
+
+    The paths in a diff given with --diff are relative to each directory
+    given, and to the current directory for the files given.
+    """
+    if options.diff is not None:
+        if options.diff == "-":
+            diff = sys.stdin.buffer.read()
+        else:
+            with open(options.diff, "rb") as f:
+                diff = f.read()
+        directories = [
+            filename for filename in options.files if os.path.isdir(filename)
+        ]
+        if options.files_from is not None or len(directories) < len(options.files):
+            directories.append(os.curdir)
+        return {
+            os.path.normpath(os.path.join(directory, patch.filename)): patch
+            for patch in parse_unified_diff(diff)
+            for directory in directories
+        }
+    if options.changed_lines_only:
+        patches = {}
+        for filename in options.files:
+            directory, paths = filename, []
+            if not os.path.isdir(filename):
+                directory = os.path.dirname(filename) or os.curdir
+                paths.append(os.path.basename(filename))
+            diff = unified_diff(directory, options.changed_since, *paths)
+            for patch in parse_unified_diff(diff):
+                path = os.path.normpath(os.path.join(directory, patch.filename))
+                patches[path] = patch
+        return patches
+    return None
+
+
+def _listed_files(
+    options: argparse.Namespace, patches: Optional[dict[str, FilePatch]]
+) -> Optional[dict[str, list[str]]]:
+    """Return the files to check below the directories given, if listed.
+
+    They are the files changed by patches, or those git knows of.
+    """
+    if patches is not None:
+        return {
+            filename: _paths_below(filename, patches)
+            for filename in options.files
+            if os.path.isdir(filename)
+        }
+    if not options.git_files and options.changed_since is None:
+        return None
+    listed_files = {}
+    for filename in options.files:
+        if not os.path.isdir(filename):
+            continue
+        if options.changed_since is not None:
+            listed_files[filename] = changed_files(filename, options.changed_since)
+        else:
+            listed_files[filename] = ls_files(filename)
+    return listed_files
+
+
+def main(*args: str) -> int:
+    """Contains flow control"""
+    start = time.perf_counter()
+    try:
+        options, parser, used_cfg_files = parse_options(args)
+    except configparser.Error as e:
+        print(
+            f"ERROR: ill-formed config file: {e.message}",
+            file=sys.stderr,
+        )
+        return EX_CONFIG
+
+    parse_options_time = time.perf_counter() - start
+
+    if options.daemon is not None:
+        from ._daemon import serve
+
+        return serve(options.daemon)
+
+    if options.profile is not None:
+        # imported here, as cProfile and tracemalloc are only needed to profile
+        from ._profile import run_profiled
+
+        output = options.profile_output or PROFILE_OUTPUTS[options.profile]
+        # fail before the run rather than after it
+        try:
+            with open(output, "wb"):
+                pass
+        except OSError as e:
+            return _usage_error(parser, f"ERROR: --profile-output: {e}")
+        return run_profiled(
+            options.profile,
+            output,
+            lambda: _main(options, parser, used_cfg_files, parse_options_time),
+        )
+    return _main(options, parser, used_cfg_files, parse_options_time)
+
+
+def _main(
+    options: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+    used_cfg_files: list[str],
+    parse_options_time: float,
+) -> int:
+    """Check the files with the parsed options."""
+    global _run_stats  # noqa: PLW0603
+
+    # Report used config files, other formats only report misspellings
+    if options.format == "text" and not (
+        options.quiet_level & QuietLevels.CONFIG_FILES
+    ):
+        if len(used_cfg_files) > 0:
+            print("Used config files:")
+        for ifile, cfg_file in enumerate(used_cfg_files, start=1):
+            print(f"    {ifile}: {cfg_file}")
+
+    if options.interactive > 0:
+        options.write_changes = True
+
+    message = _options_error(options)
+    if message is not None:
+        return _usage_error(parser, message)
+    start = time.perf_counter()
     try:
-        glob_match.match("/random/path")  # does not need a real path
+        checker = Spellchecker._from_options(options)
+    except ValueError as e:
+        return _usage_error(parser, f"ERROR: {e}")
+    build_dict_time = time.perf_counter() - start
+    word_regex = checker.word_regex
+    ignore_word_regex = checker.ignore_word_regex
+    ignore_multiline_regex = checker.ignore_multiline_regex
+    ignore_words = checker.ignore_words
+    ignore_words_cased = checker.ignore_words_cased
+    uri_regex = checker.uri_regex
+    uri_ignore_words = checker.uri_ignore_words
+    use_dictionaries = checker.use_dictionaries
+    misspellings = checker.misspellings
+    exclude_lines = checker.exclude_lines
+    file_opener = checker.file_opener
+
+    colors = TermColors()
+    if not options.colors:
+        colors.disable()
+
+    summary = Summary() if options.summary else None
+
+    context = _context_lines(options)
+
+    try:
+        glob_match = GlobMatch(
+            flatten_clean_comma_separated_arguments(options.skip)
+            if options.skip
+            else []
+        )
     except re.error:
         return _usage_error(
             parser,
@@ -1488,72 +3145,125 @@ def main(*args: str) -> int:
             "try escaping special characters",
         )
 
-    bad_count = 0
-    for filename in sorted(options.files):
-        # ignore hidden files
-        if is_hidden(filename, options.check_hidden):
-            continue
-
-        if os.path.isdir(filename):
-            for root, dirs, files in os.walk(filename):
-                if glob_match.match(root):  # skip (absolute) directories
-                    dirs.clear()
-                    continue
-                if is_hidden(root, options.check_hidden):  # dir itself hidden
-                    continue
-                for file_ in sorted(files):
-                    # ignore hidden files in directories
-                    if is_hidden(file_, options.check_hidden):
-                        continue
-                    if glob_match.match(file_):  # skip files
-                        continue
-                    fname = os.path.join(root, file_)
-                    if glob_match.match(fname):  # skip paths
-                        continue
-                    bad_count += parse_file(
-                        fname,
-                        colors,
-                        summary,
-                        misspellings,
-                        ignore_words_cased,
-                        exclude_lines,
-                        file_opener,
-                        word_regex,
-                        ignore_word_regex,
-                        uri_regex,
-                        uri_ignore_words,
-                        context,
-                        options,
-                    )
-
-                # skip (relative) directories
-                dirs[:] = [
-                    dir_
-                    for dir_ in dirs
-                    if not glob_match.match(dir_)
-                    and not is_hidden(dir_, options.check_hidden)
-                ]
-
-        elif not glob_match.match(filename):  # skip files
-            bad_count += parse_file(
-                filename,
-                colors,
-                summary,
-                misspellings,
-                ignore_words_cased,
-                exclude_lines,
-                file_opener,
-                word_regex,
-                ignore_word_regex,
-                uri_regex,
-                uri_ignore_words,
+    try:
+        patches = _read_patches(options)
+    except OSError as e:
+        return _usage_error(parser, f"ERROR: --diff: {e}")
+    except GitError as e:
+        return _usage_error(parser, f"ERROR: --changed-since: {e}")
+    try:
+        listed_files = _listed_files(options, patches)
+    except GitError as e:
+        git_option = "--git-files"
+        if options.changed_since is not None:
+            git_option = "--changed-since"
+        return _usage_error(parser, f"ERROR: {git_option}: {e}")
+
+    content_options = options
+    if options.dedup == "content" and options.check_filenames:
+        # the name of each file is checked apart from its content
+        content_options = argparse.Namespace(**vars(options))
+        content_options.check_filenames = False
+    check_args = CheckArgs(
+        colors,
+        summary,
+        misspellings,
+        ignore_words_cased,
+        exclude_lines,
+        file_opener,
+        word_regex,
+        ignore_word_regex,
+        uri_regex,
+        uri_ignore_words,
+        context,
+        content_options,
+        checker._word_verdicts,
+    )
+    # Results can only be reused when files are not modified by the check.
+    results_cache = None
+    if options.cache_dir and not options.write_changes:
+        results_cache = ResultsCache(
+            options.cache_dir,
+            results_cache_fingerprint(
+                VERSION,
+                _dict_cache_key(use_dictionaries, ignore_words),
+                sorted(ignore_words_cased),
+                sorted(exclude_lines),
+                word_regex.pattern,
+                ignore_word_regex.pattern if ignore_word_regex else None,
+                ignore_multiline_regex.pattern if ignore_multiline_regex else None,
+                uri_regex.pattern,
+                sorted(uri_ignore_words),
                 context,
-                options,
-            )
+                options.colors,
+                options.quiet_level,
+                options.hard_encoding_detection,
+                content_options.check_filenames,
+                options.ignore_sic,
+                options.format,
+            ),
+            options.cache_max_size * 1024 * 1024,
+        )
 
-    if summary:
-        print("\n-------8<-------\nSUMMARY:")
-        print(summary)
+    files: Iterable[str] = sorted(options.files)
+    paths_file: contextlib.AbstractContextManager[Optional[BinaryIO]] = (
+        contextlib.nullcontext()
+    )
+    if options.files_from == "-":
+        paths_file = contextlib.nullcontext(sys.stdin.buffer)
+    elif options.files_from is not None:
+        try:
+            paths_file = open(options.files_from, "rb")
+        except OSError as e:
+            return _usage_error(parser, f"ERROR: --files-from: {e}")
+
+    if options.stats:
+        _run_stats = RunStats()
+        _run_stats.timings["parse_options"] = parse_options_time
+        _run_stats.timings["build_dict"] = build_dict_time
+    try:
+        with paths_file as f:
+            if f is not None:
+                files = itertools.chain(files, _read_paths(f))
+            filenames = _iter_files(
+                files, glob_match, options.check_hidden, listed_files
+            )
+            if options.stats:
+                filenames = _visit_files(filenames)
+            writer: Optional[io.TextIOBase] = None
+            if options.format == "sarif":
+                writer = SarifWriter(sys.stdout, VERSION)
+            elif options.format == "jsonl":
+                writer = JsonLinesWriter(sys.stdout)
+            with contextlib.redirect_stdout(writer or sys.stdout):
+                bad_count = _parse_files(
+                    filenames, options, check_args, results_cache, patches
+                )
+        _enter_phase("output")
+        # findings are buffered as found and written out once all are, the
+        # SARIF log being completed then
+        if writer is not None:
+            writer.close()
+        if results_cache is not None and results_cache.stored:
+            _enter_phase("write")
+            results_cache.evict()
+
+        _enter_phase("output")
+        if summary:
+            print("\n-------8<-------\nSUMMARY:")
+            print(summary)
+    finally:
+        run_stats, _run_stats = _run_stats, None
+    if run_stats is not None:
+        run_stats.stop()
+        counters = run_stats.counters
+        counters["misspellings"] = bad_count
+        hits, misses = checker._word_verdicts.stats()
+        counters["verdict_cache_hits"] = hits
+        counters["verdict_cache_misses"] = misses
+        counters["candidate_tokens"] = hits + misses
+        stats_format = "table" if options.format == "text" else "json"
+        print(run_stats.report(stats_format), file=sys.stderr)
     if options.count:
         print(bad_count, file=sys.stderr)
     return EX_DATAERR if bad_count else EX_OK
@@ -0,0 +1,289 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import base64
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import traceback
+from typing import Any, Optional, TextIO
+
+# Output is sent back to the client in frames of at most this many characters.
+_FRAME_SIZE = 65536
+
+
+def _private_dir() -> str:
+    """Return the directory of the socket in the shared temporary directory."""
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"codespell-{uid}")
+
+
+def default_socket_path() -> str:
+    path = os.environ.get("CODESPELL_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "codespell.sock")
+    return os.path.join(_private_dir(), "daemon.sock")
+
+
+def _owned(st: os.stat_result) -> bool:
+    return not hasattr(os, "getuid") or st.st_uid == os.getuid()
+
+
+def _check_private_dir(directory: str) -> None:
+    """Raise OSError unless directory is only accessible to the user.
+
+    Another user could otherwise create it first, and receive the requests
+    meant for the daemon.
+    """
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or not _owned(st) or st.st_mode & 0o077:
+        msg = f"{directory} is not a directory private to the user"
+        raise OSError(msg)
+
+
+def _check_socket(socket_path: str) -> None:
+    """Raise OSError unless socket_path is a socket of the user."""
+    if os.path.dirname(socket_path) == _private_dir():
+        _check_private_dir(_private_dir())
+    st = os.lstat(socket_path)
+    if not stat.S_ISSOCK(st.st_mode) or not _owned(st):
+        msg = f"{socket_path} is not a socket of the user"
+        raise OSError(msg)
+
+
+def _send(wfile: io.BufferedIOBase, frame: dict[str, Any]) -> None:
+    wfile.write(json.dumps(frame).encode() + b"\n")
+    wfile.flush()
+
+
+class _FrameWriter(io.TextIOBase):
+    """Text stream forwarding what is written to the client in frames."""
+
+    def __init__(self, wfile: io.BufferedIOBase, name: str, tty: bool) -> None:
+        self.wfile = wfile
+        self.name = name
+        self.tty = tty
+        self._parts: list[str] = []
+        self._size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    def write(self, s: str) -> int:
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= _FRAME_SIZE:
+            self.flush()
+        return len(s)
+
+    def flush(self) -> None:
+        if self._parts:
+            _send(self.wfile, {self.name: "".join(self._parts)})
+            self._parts.clear()
+            self._size = 0
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            args = [str(arg) for arg in request["argv"]]
+            stdin_data = base64.b64decode(request.get("stdin") or "")
+        except (ValueError, KeyError, TypeError):
+            return
+        from . import _codespell
+
+        stdout = _FrameWriter(self.wfile, "stdout", bool(request.get("tty")))
+        stderr = _FrameWriter(self.wfile, "stderr", False)
+        cwd = os.getcwd()
+        stdin = sys.stdin
+        try:
+            os.chdir(request.get("cwd") or cwd)
+            # paths and diffs are read from the buffer of stdin as bytes
+            sys.stdin = io.TextIOWrapper(io.BytesIO(stdin_data), encoding="utf-8")
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                code = _run(args)
+        except OSError as e:
+            print(f"ERROR: {e}", file=stderr)
+            code = _codespell.EX_USAGE
+        finally:
+            sys.stdin = stdin
+            os.chdir(cwd)
+        stdout.flush()
+        stderr.flush()
+        _send(self.wfile, {"exit": code})
+
+
+def _run(args: list[str]) -> int:
+    import configparser
+
+    from . import _codespell
+
+    try:
+        try:
+            options = _codespell.parse_options(args)[0]
+        except configparser.Error:
+            # reported by main()
+            return _codespell.main(*args)
+        if options.daemon is not None:
+            print("ERROR: --daemon cannot be forwarded to the daemon", file=sys.stderr)
+            return _codespell.EX_USAGE
+        # the daemon has no terminal to ask from, i.e. no answer means yes
+        if options.interactive:
+            print(
+                "ERROR: --interactive cannot be used through the daemon",
+                file=sys.stderr,
+            )
+            return _codespell.EX_USAGE
+        return _codespell.main(*args)
+    except SystemExit as e:  # e.g. --help or an invalid option
+        return e.code if isinstance(e.code, int) else _codespell.EX_USAGE
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Server running codespell for each connection, one at a time."""
+
+    def __init__(self, socket_path: str) -> None:
+        if os.path.exists(socket_path):
+            # Replace a socket left behind by a daemon that is gone.
+            with socket.socket(socket.AF_UNIX) as sock:
+                try:
+                    sock.connect(socket_path)
+                except OSError:
+                    os.remove(socket_path)
+        # Only the owner may connect, as requests can rewrite files.
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self.socket_path = socket_path
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(OSError):
+            os.remove(self.socket_path)
+
+
+def serve(socket_path: str) -> int:
+    """Run the daemon on socket_path until interrupted."""
+    from . import _codespell
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("ERROR: --daemon requires Unix domain sockets", file=sys.stderr)
+        return _codespell.EX_USAGE
+    socket_path = socket_path or default_socket_path()
+    # Keep the dictionaries of recent requests in memory.
+    _codespell._dictionaries_memo = {}
+    try:
+        if os.path.dirname(socket_path) == _private_dir():
+            with contextlib.suppress(FileExistsError):
+                os.mkdir(_private_dir(), 0o700)
+            _check_private_dir(_private_dir())
+        server = DaemonServer(socket_path)
+    except OSError as e:
+        print(f"ERROR: cannot listen on {socket_path}: {e}", file=sys.stderr)
+        return _codespell.EX_USAGE
+    with server:
+        print(f"codespell daemon listening on {socket_path}", file=sys.stderr)
+        server.serve_forever()
+    return _codespell.EX_OK
+
+
+def _reads_stdin(args: list[str]) -> bool:
+    """Tell whether args name stdin, as a file or as the value of an option."""
+    return any(arg == "-" or arg.endswith("=-") for arg in args)
+
+
+def _read_stdin() -> bytes:
+    # stdin may have been replaced by a text stream, e.g. in tests
+    if hasattr(sys.stdin, "buffer"):
+        return sys.stdin.buffer.read()
+    return sys.stdin.read().encode()
+
+
+def run_client(
+    args: list[str],
+    socket_path: Optional[str] = None,
+    stdout: Optional[TextIO] = None,
+    stderr: Optional[TextIO] = None,
+) -> int:
+    """Run codespell through the daemon, or in this process if none is running."""
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    socket_path = socket_path or default_socket_path()
+    sock = None
+    if hasattr(socket, "AF_UNIX"):
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            _check_socket(socket_path)
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            sock = None
+    if sock is None:
+        # imported only now, the client being kept light to start
+        from . import _codespell
+
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            return _codespell.main(*args)
+
+    request = {
+        "argv": args,
+        "cwd": os.getcwd(),
+        "tty": stdout.isatty(),
+        "stdin": (
+            base64.b64encode(_read_stdin()).decode() if _reads_stdin(args) else None
+        ),
+    }
+    with sock, sock.makefile("rwb") as f:
+        _send(f, request)
+        for line in f:
+            frame = json.loads(line)
+            if "exit" in frame:
+                return int(frame["exit"])
+            if "stdout" in frame:
+                stdout.write(frame["stdout"])
+            if "stderr" in frame:
+                stderr.write(frame["stderr"])
+    print("ERROR: connection to the codespell daemon was lost", file=stderr)
+    return 1
+
+
+def _client_main() -> int:
+    """Entry point of codespell-client."""
+    try:
+        return run_client(sys.argv[1:])
+    except KeyboardInterrupt:
+        sys.stdout.write("\n")
+        return 130
@@ -0,0 +1,165 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import os
+import re
+from collections.abc import Sequence
+from re import Match
+from typing import Optional
+
+_hunk_header_regex = re.compile(rb"@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_quoted_char_regex = re.compile(rb"\\([0-7]{1,3}|.)")
+_quoted_chars = {
+    b"a": b"\a",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+    b"v": b"\v",
+}
+
+
+class FilePatch:
+    """What a unified diff tells about the new version of a file.
+
+    lines maps the line numbers of the new version given by the diff, be
+    they added or context lines, to their text without the line ending.
+    added lists the line numbers of the added lines.
+    """
+
+    __slots__ = ("added", "filename", "lines", "new_file")
+
+    def __init__(self, filename: str, new_file: bool) -> None:
+        self.filename = filename
+        self.new_file = new_file
+        self.lines: dict[int, str] = {}
+        self.added: list[int] = []
+
+    def matches(self, lines: Sequence[str]) -> bool:
+        """Tell whether lines, with their line endings, agree with the diff."""
+        for line_number, line in self.lines.items():
+            if line_number > len(lines):
+                return False
+            actual = lines[line_number - 1]
+            if actual.endswith("\n"):
+                actual = actual[:-1]
+            if actual != line:
+                return False
+        return True
+
+    def text(self) -> str:
+        """Rebuild the new version, with empty lines where the diff has none."""
+        if not self.lines:
+            return ""
+        return "".join(
+            self.lines.get(line_number, "") + "\n"
+            for line_number in range(1, max(self.lines) + 1)
+        )
+
+
+def _unquote(path: bytes) -> bytes:
+    """Undo the C-style quoting of unusual paths by git."""
+    if len(path) < 2 or not path.startswith(b'"') or not path.endswith(b'"'):
+        return path
+
+    def unquote_char(match: Match[bytes]) -> bytes:
+        char = match.group(1)
+        if char[:1].isdigit():
+            return bytes([int(char, 8) & 0xFF])
+        return _quoted_chars.get(char, char)
+
+    return _quoted_char_regex.sub(unquote_char, path[1:-1])
+
+
+def _header_path(line: bytes) -> Optional[bytes]:
+    """Return the path of a ---/+++ line, None for /dev/null."""
+    path = line[4:].rstrip(b"\r")
+    if not path.startswith(b'"'):
+        # diff -u appends the modification time after a tab
+        path = path.split(b"\t", 1)[0]
+    path = _unquote(path)
+    return None if path == b"/dev/null" else path
+
+
+def parse_unified_diff(diff: bytes) -> list[FilePatch]:
+    """Return the new version of the files changed by a unified diff.
+
+    Paths prefixed with a/ and b/, as git writes them, have the prefix
+    removed. Deleted files are left out.
+    """
+    try:
+        diff.decode("utf-8")
+    except UnicodeDecodeError:
+        encoding = "iso-8859-1"
+    else:
+        encoding = "utf-8"
+
+    patches: list[FilePatch] = []
+    patch: Optional[FilePatch] = None
+    old_path: Optional[bytes] = None
+    old_remaining = new_remaining = 0
+    line_number = 0
+    # Only "\n" ends lines, a "\r" before it belongs to the line.
+    for line in diff.split(b"\n"):
+        if old_remaining > 0 or new_remaining > 0:
+            marker = line[:1]
+            if marker in {b" ", b""}:
+                # some tools strip the space of empty context lines
+                if patch is not None:
+                    patch.lines[line_number] = line[1:].decode(encoding)
+                line_number += 1
+                old_remaining -= 1
+                new_remaining -= 1
+                continue
+            if marker == b"+":
+                if patch is not None:
+                    patch.lines[line_number] = line[1:].decode(encoding)
+                    patch.added.append(line_number)
+                line_number += 1
+                new_remaining -= 1
+                continue
+            if marker == b"-":
+                old_remaining -= 1
+                continue
+            if marker == b"\\":  # "\ No newline at end of file"
+                continue
+            # truncated hunk, look for the next header
+            old_remaining = new_remaining = 0
+
+        if line.startswith(b"--- "):
+            old_path = _header_path(line)
+        elif line.startswith(b"+++ "):
+            new_path = _header_path(line)
+            patch = None
+            if new_path is not None:
+                if new_path.startswith(b"b/") and (
+                    old_path is None or old_path.startswith(b"a/")
+                ):
+                    new_path = new_path[2:]
+                filename = os.path.join(*os.fsdecode(new_path).split("/"))
+                patch = FilePatch(filename, new_file=old_path is None)
+                patches.append(patch)
+        else:
+            match = _hunk_header_regex.match(line)
+            if match:
+                old_count, new_start, new_count = match.groups()
+                old_remaining = 1 if old_count is None else int(old_count)
+                new_remaining = 1 if new_count is None else int(new_count)
+                line_number = int(new_start)
+    return patches
@@ -0,0 +1,106 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import os
+import subprocess
+
+
+class GitError(Exception):
+    pass
+
+
+def _run_git(directory: str, *args: str) -> bytes:
+    try:
+        proc = subprocess.run(  # noqa: S603
+            ["git", "-C", directory, *args],  # noqa: S607
+            capture_output=True,
+            check=False,
+        )
+    except OSError as e:
+        msg = f"cannot run git: {e}"
+        raise GitError(msg) from e
+    if proc.returncode != 0:
+        message = os.fsdecode(proc.stderr).strip().splitlines()
+        msg = message[-1] if message else f"git {args[0]} failed in {directory}"
+        raise GitError(msg)
+    return proc.stdout
+
+
+def _check_revision(rev: str) -> None:
+    # git would take it for an option
+    if rev.startswith("-"):
+        msg = f"invalid revision: {rev}"
+        raise GitError(msg)
+
+
+def _split_paths(output: bytes) -> list[str]:
+    """Split NUL-terminated git paths, converting them to native paths."""
+    return [
+        os.path.join(*os.fsdecode(path).split("/"))
+        for path in output.split(b"\0")
+        if path
+    ]
+
+
+def ls_files(directory: str) -> list[str]:
+    """Return the files tracked by git below directory, relative to it."""
+    return _split_paths(_run_git(directory, "ls-files", "-z", "--cached"))
+
+
+def changed_files(directory: str, rev: str) -> list[str]:
+    """Return the files below directory changed since rev, relative to it.
+
+    rev is anything git diff accepts, e.g. a commit or "main...HEAD".
+    Deleted files are left out.
+    """
+    _check_revision(rev)
+    return _split_paths(
+        _run_git(
+            directory,
+            "diff",
+            "--name-only",
+            "-z",
+            "--relative",
+            "--no-renames",
+            "--diff-filter=d",
+            rev,
+            "--",
+        )
+    )
+
+
+def unified_diff(directory: str, rev: str, *paths: str) -> bytes:
+    """Return the unified diff of the files below directory since rev.
+
+    The paths in the diff are relative to directory. paths restricts the
+    diff to some files.
+    """
+    _check_revision(rev)
+    return _run_git(
+        directory,
+        "diff",
+        "--no-color",
+        "--no-ext-diff",
+        "--relative",
+        "--find-renames",
+        "--src-prefix=a/",
+        "--dst-prefix=b/",
+        rev,
+        "--",
+        *paths,
+    )
@@ -0,0 +1,198 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import io
+import json
+import os
+from typing import NamedTuple, TextIO
+
+_SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+_SARIF_RULE = "misspelling"
+# Characters of JSON lines buffered before they are written out together.
+_JSONL_BUFFER_SIZE = 1 << 16
+
+
+class Finding(NamedTuple):
+    """A misspelling found by Spellchecker.check_text().
+
+    line and column count from 1. correction is the fix in the case of the
+    word, or the comma-separated candidates when there are several. fixable
+    tells whether the correction is applied by --write-changes.
+    """
+
+    line: int
+    column: int
+    word: str
+    correction: str
+    reason: str
+    fixable: bool
+
+
+def _artifact_uri(filename: str) -> str:
+    # imported here, as it takes long and is only needed for SARIF
+    import urllib.parse
+
+    path = os.path.normpath(filename).replace(os.sep, "/")
+    if os.path.isabs(filename):
+        return "file://" + urllib.parse.quote(path if path[0] == "/" else "/" + path)
+    return urllib.parse.quote(path)
+
+
+def _finding_prefix(filename: str, output_format: str) -> str:
+    """Return how the lines reporting the findings in filename start."""
+    if output_format == "sarif":
+        uri = json.dumps(_artifact_uri(filename))
+        return (
+            '{"locations": [{"physicalLocation": '
+            f'{{"artifactLocation": {{"uri": {uri}}}'
+        )
+    return f'{{"file": {json.dumps(filename)},'
+
+
+def format_finding(filename: str, finding: Finding, output_format: str) -> str:
+    """Return the line of JSON reporting finding in filename.
+
+    With "jsonl" it is the finding and the name of the file, with "sarif"
+    a SARIF result. Findings in the name of the file are on line 0.
+    """
+    prefix = _finding_prefix(filename, output_format)
+    if output_format != "sarif":
+        return f"{prefix} {json.dumps(finding._asdict())[1:]}"
+
+    region = ""
+    if finding.line:
+        region = ', "region": ' + json.dumps(
+            {
+                "startLine": finding.line,
+                "startColumn": finding.column,
+                "endColumn": finding.column + len(finding.word),
+            }
+        )
+    message = f"{finding.word} ==> {finding.correction}"
+    if finding.reason:
+        message += f" | {finding.reason}"
+    result = {
+        "ruleId": _SARIF_RULE,
+        "level": "warning",
+        "message": {"text": message},
+        "properties": {
+            "word": finding.word,
+            "correction": finding.correction,
+            "reason": finding.reason,
+            "fixable": finding.fixable,
+        },
+    }
+    return f"{prefix}{region}}}}}], {json.dumps(result)[1:]}"
+
+
+class JsonLinesWriter(io.TextIOBase):
+    """Write the JSON lines written to it to stream, in large chunks.
+
+    All lines are written out once closed.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        super().__init__()
+        self.stream = stream
+        self._pending: list[str] = []
+        self._pending_size = 0
+
+    def _write_pending(self) -> None:
+        self.stream.write("".join(self._pending))
+        self._pending.clear()
+        self._pending_size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= _JSONL_BUFFER_SIZE:
+            self._write_pending()
+        return len(text)
+
+    def flush(self) -> None:
+        self._write_pending()
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.flush()
+        super().close()
+
+
+class SarifWriter(io.TextIOBase):
+    """Write a SARIF log to stream, of the results written one per line.
+
+    The log is complete once closed.
+    """
+
+    def __init__(self, stream: TextIO, version: str) -> None:
+        super().__init__()
+        self.stream = stream
+        self._pending = ""
+        self._results = 0
+        run = {
+            "tool": {
+                "driver": {
+                    "name": "codespell",
+                    "version": version,
+                    "informationUri": "https://github.com/codespell-project/codespell",
+                    "rules": [
+                        {
+                            "id": _SARIF_RULE,
+                            "shortDescription": {"text": "Misspelled word"},
+                        }
+                    ],
+                }
+            },
+            "columnKind": "unicodeCodePoints",
+        }
+        log = json.dumps({"$schema": _SARIF_SCHEMA, "version": "2.1.0", "runs": [run]})
+        # the results are the last member of the run
+        stream.write(f'{log[: -len("}]}")]}, "results": [')
+
+    def _write_result(self, result: str) -> None:
+        self.stream.write(",\n" if self._results else "\n")
+        self.stream.write(result)
+        self._results += 1
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        *results, self._pending = (self._pending + text).split("\n")
+        for result in results:
+            if result:
+                self._write_result(result)
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self._pending:
+            self._write_result(self._pending)
+            self._pending = ""
+        self.stream.write("\n]}]}\n")
+        self.stream.flush()
+        super().close()
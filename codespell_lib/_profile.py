@@ -0,0 +1,125 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import cProfile
+import linecache
+import threading
+import tracemalloc
+from typing import Callable, Optional
+
+# Number of lines of the allocation report, and of the frames kept for it.
+_TOP_ALLOCATIONS = 25
+_TRACEBACK_FRAMES = 1
+# Seconds between samples of the traced memory, and growth since the last
+# snapshot for another one to be taken.
+_SAMPLE_INTERVAL = 0.01
+_SNAPSHOT_GROWTH = 1.1
+
+
+def _format_size(size: int) -> str:
+    return f"{size / 1024:.1f} KiB"
+
+
+def format_allocations(
+    snapshot: tracemalloc.Snapshot, peak: int, top: int = _TOP_ALLOCATIONS
+) -> str:
+    """Return the lines allocating the most memory in snapshot."""
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        )
+    )
+    statistics = snapshot.statistics("lineno")
+    total = sum(statistic.size for statistic in statistics)
+    lines = [
+        f"Peak memory: {_format_size(peak)}",
+        f"Allocated at the highest sample: {_format_size(total)}",
+        f"Top {min(top, len(statistics))} lines by memory allocated then:",
+    ]
+    for i, statistic in enumerate(statistics[:top], start=1):
+        frame = statistic.traceback[0]
+        lines.append(
+            f"#{i}: {frame.filename}:{frame.lineno}: "
+            f"{_format_size(statistic.size)} in {statistic.count} blocks"
+        )
+        source = linecache.getline(frame.filename, frame.lineno).strip()
+        if source:
+            lines.append(f"    {source}")
+    return "\n".join(lines) + "\n"
+
+
+class _PeakSampler(threading.Thread):
+    """Sample the traced memory, keeping a snapshot of it at its highest.
+
+    Memory freed before the end of a run, e.g. that of files read, is so
+    reported too.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self._size = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(_SAMPLE_INTERVAL):
+            self.sample()
+
+    def sample(self, growth: float = _SNAPSHOT_GROWTH) -> None:
+        size, _ = tracemalloc.get_traced_memory()
+        if self.snapshot is None or size > self._size * growth:
+            # snapshots are traced too, the previous one is not kept in this one
+            self.snapshot = None
+            self.snapshot = tracemalloc.take_snapshot()
+            self._size, _ = tracemalloc.get_traced_memory()
+
+    def finish(self) -> tracemalloc.Snapshot:
+        """Stop sampling, returning the snapshot, or one at exit if higher."""
+        self._done.set()
+        if self.is_alive():
+            self.join()
+        self.sample(growth=1.0)
+        return self.snapshot or tracemalloc.take_snapshot()
+
+
+def run_profiled(kind: str, output: str, run: Callable[[], int]) -> int:
+    """Call run under cProfile or tracemalloc, writing the profile to output.
+
+    With "cpu" output is a pstats file, e.g. for python -m pstats, with
+    "mem" a report of the lines allocating the most memory.
+    """
+    if kind == "cpu":
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(run)
+        finally:
+            profiler.dump_stats(output)
+
+    tracemalloc.start(_TRACEBACK_FRAMES)
+    sampler = _PeakSampler()
+    sampler.start()
+    try:
+        return run()
+    finally:
+        snapshot = sampler.finish()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(format_allocations(snapshot, peak))
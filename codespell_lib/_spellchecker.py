@@ -16,22 +16,126 @@ Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
 Copyright (C) 2011  ProFUSION embedded systems
 """
 
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from collections.abc import Iterator, KeysView, Mapping, MutableMapping
+from typing import Union
+
+# Bump whenever the layout of the binary dictionary files changes.
+_DICT_CACHE_VERSION = 4
+_MAPPED_MAGIC = b"CSPD"
+# magic, version, number of slots, keys and corrections, and the offsets of
+# the key records and corrections sections.
+_MAPPED_HEADER = struct.Struct("=4sIIIIII")
+_MAPPED_HEADER_SIZE = 32
+# correction index and key length, followed by the UTF-8 key itself, whose
+# length is not limited by that of lines in custom dictionaries
+_MAPPED_RECORD = struct.Struct("=II")
+
 # Pass all misspellings through this translation table to generate
 # alternative misspellings and fixes.
 alt_chars = (("'", "’"),)  # noqa: RUF001
 
 
 class Misspelling:
+    __slots__ = ("data", "fix", "reason")
+
     def __init__(self, data: str, fix: bool, reason: str) -> None:
         self.data = data
         self.fix = fix
         self.reason = reason
 
 
+class Misspellings(MutableMapping[str, Misspelling]):
+    """Compact mapping of misspelled words to their Misspelling.
+
+    Instead of one Misspelling object per key, each key refers by index to
+    a table of interned ``(data, fix, reason)`` corrections, which many keys
+    share. Misspelling objects are created on first access and kept, so
+    that changes made to them (e.g. in interactive mode) persist.
+    """
+
+    def __init__(self) -> None:
+        self._index: dict[str, int] = {}
+        self._table: list[tuple[str, bool, str]] = []
+        self._interned: dict[tuple[str, bool, str], int] = {}
+        self._materialized: dict[str, Misspelling] = {}
+
+    @classmethod
+    def from_tables(
+        cls,
+        keys: list[str],
+        indices: list[int],
+        table: list[tuple[str, bool, str]],
+    ) -> "Misspellings":
+        misspellings = cls()
+        misspellings._index = dict(zip(keys, indices))
+        misspellings._table = table
+        return misspellings
+
+    def to_tables(self) -> tuple[list[str], list[int], list[tuple[str, bool, str]]]:
+        for key, misspelling in self._materialized.items():
+            self._set(key, misspelling.data, misspelling.fix, misspelling.reason)
+        return list(self._index), list(self._index.values()), self._table
+
+    def compact(self) -> None:
+        """Release what is only needed to share corrections while adding keys.
+
+        It is rebuilt if keys are added later on.
+        """
+        self._interned = {}
+
+    def _set(self, key: str, data: str, fix: bool, reason: str) -> None:
+        if not self._interned and self._table:
+            self._interned = {c: i for i, c in enumerate(self._table)}
+        correction = (data, fix, reason)
+        index = self._interned.get(correction)
+        if index is None:
+            index = self._interned[correction] = len(self._table)
+            self._table.append(correction)
+        self._index[key] = index
+
+    def add(self, key: str, data: str, fix: bool, reason: str) -> None:
+        self._set(key, data, fix, reason)
+        self._materialized.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __getitem__(self, key: str) -> Misspelling:
+        misspelling = self._materialized.get(key)
+        if misspelling is None:
+            misspelling = Misspelling(*self._table[self._index[key]])
+            self._materialized[key] = misspelling
+        return misspelling
+
+    def __setitem__(self, key: str, value: Misspelling) -> None:
+        self._set(key, value.data, value.fix, value.reason)
+        self._materialized[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._index[key]
+        self._materialized.pop(key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self) -> KeysView[str]:
+        # set operations on the keys of a dict do not call back into Python
+        return self._index.keys()
+
+
 def add_misspelling(
     key: str,
     data: str,
-    misspellings: dict[str, Misspelling],
+    misspellings: MutableMapping[str, Misspelling],
 ) -> None:
     data = data.strip()
 
@@ -43,12 +147,15 @@ def add_misspelling(
         fix = True
         reason = ""
 
-    misspellings[key] = Misspelling(data, fix, reason)
+    if isinstance(misspellings, Misspellings):
+        misspellings.add(key, data, fix, reason)
+    else:
+        misspellings[key] = Misspelling(data, fix, reason)
 
 
 def build_dict(
     filename: str,
-    misspellings: dict[str, Misspelling],
+    misspellings: MutableMapping[str, Misspelling],
     ignore_words: set[str],
 ) -> None:
     with open(filename, encoding="utf-8") as f:
@@ -68,3 +175,209 @@ def build_dict(
                     alt_data = data.translate(table)
                     if alt_key not in ignore_words:
                         add_misspelling(alt_key, alt_data, misspellings)
+
+
+class MappedMisspellings(Mapping[str, Misspelling]):
+    """Read-only misspellings queried in place from a memory-mapped file.
+
+    Files are written by write_mapped_dict(). Keys are found through an
+    open-addressing hash table of ``(crc32, record offset)`` slots, so
+    nothing is parsed on load and all processes mapping the same file
+    share a single copy of it through the page cache.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self._filename = filename
+        with open(filename, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (
+                magic,
+                version,
+                self._nslots,
+                self._nkeys,
+                ncorrections,
+                self._keys_offset,
+                corrections_offset,
+            ) = _MAPPED_HEADER.unpack_from(self._mm)
+            valid = magic == _MAPPED_MAGIC and version == _DICT_CACHE_VERSION
+            if valid:
+                self._slots = memoryview(self._mm)[
+                    _MAPPED_HEADER_SIZE : self._keys_offset
+                ].cast("I")
+                self._corrections = memoryview(self._mm)[
+                    corrections_offset : corrections_offset + 4 * (ncorrections + 1)
+                ].cast("I")
+        except (struct.error, TypeError, ValueError):
+            valid = False
+        if not valid:
+            self._mm.close()
+            msg = f"not a binary dictionary file: {filename}"
+            raise ValueError(msg)
+        self._corrections_blob = corrections_offset + 4 * (ncorrections + 1)
+        self._materialized: dict[str, Misspelling] = {}
+
+    def __reduce__(self) -> tuple[type["MappedMisspellings"], tuple[str]]:
+        # Processes started with "spawn" map the file again.
+        return MappedMisspellings, (self._filename,)
+
+    def _find(self, key: str) -> int:
+        """Return the correction index of key, or -1 if it is missing."""
+        try:
+            raw = key.encode("utf-8")
+        except UnicodeEncodeError:
+            return -1
+        h = zlib.crc32(raw)
+        slots = self._slots
+        i = h % self._nslots
+        while True:
+            offset = slots[2 * i + 1]
+            if not offset:
+                return -1
+            if slots[2 * i] == h:
+                index, length = _MAPPED_RECORD.unpack_from(self._mm, offset)
+                start = offset + _MAPPED_RECORD.size
+                if self._mm[start : start + length] == raw:
+                    return int(index)
+            i = (i + 1) % self._nslots
+
+    def _correction(self, index: int) -> Misspelling:
+        start = self._corrections_blob + self._corrections[index]
+        end = self._corrections_blob + self._corrections[index + 1]
+        data, reason = self._mm[start + 1 : end].decode("utf-8").split("\0")
+        return Misspelling(data, self._mm[start] == ord("1"), reason)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._materialized:
+            return True
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __getitem__(self, key: str) -> Misspelling:
+        misspelling = self._materialized.get(key)
+        if misspelling is None:
+            index = self._find(key)
+            if index < 0:
+                raise KeyError(key)
+            misspelling = self._materialized[key] = self._correction(index)
+        return misspelling
+
+    def __iter__(self) -> Iterator[str]:
+        offset = self._keys_offset
+        for _ in range(self._nkeys):
+            _, length = _MAPPED_RECORD.unpack_from(self._mm, offset)
+            offset += _MAPPED_RECORD.size
+            yield self._mm[offset : offset + length].decode("utf-8")
+            offset += length
+
+    def __len__(self) -> int:
+        return int(self._nkeys)
+
+
+def write_mapped_dict(
+    filename: str,
+    misspellings: Union[Misspellings, Mapping[str, Misspelling]],
+) -> None:
+    """Write misspellings in the binary format read by MappedMisspellings."""
+    if isinstance(misspellings, Misspellings):
+        keys, indices, table = misspellings.to_tables()
+    else:
+        compact = Misspellings()
+        for key, misspelling in misspellings.items():
+            compact[key] = misspelling
+        keys, indices, table = compact.to_tables()
+
+    corrections = array("I", [0])
+    corrections_blob = bytearray()
+    for data, fix, reason in table:
+        corrections_blob += b"1" if fix else b"0"
+        corrections_blob += f"{data}\0{reason}".encode()
+        corrections.append(len(corrections_blob))
+
+    # Keep the hash table sparse, as linear probing clusters quickly.
+    nslots = 4 * len(keys) + 1
+    slots = array("I", bytes(8 * nslots))
+    keys_offset = _MAPPED_HEADER_SIZE + 8 * nslots
+    records = bytearray()
+    for key, index in zip(keys, indices):
+        raw = key.encode("utf-8")
+        h = zlib.crc32(raw)
+        i = h % nslots
+        while slots[2 * i + 1]:
+            i = (i + 1) % nslots
+        slots[2 * i] = h
+        slots[2 * i + 1] = keys_offset + len(records)
+        records += _MAPPED_RECORD.pack(index, len(raw))
+        records += raw
+    records += bytes(-len(records) % 4)  # keep the corrections aligned
+    corrections_offset = keys_offset + len(records)
+
+    with open(filename, "wb") as f:
+        header = _MAPPED_HEADER.pack(
+            _MAPPED_MAGIC,
+            _DICT_CACHE_VERSION,
+            nslots,
+            len(keys),
+            len(table),
+            keys_offset,
+            corrections_offset,
+        )
+        f.write(header.ljust(_MAPPED_HEADER_SIZE, b"\0"))
+        f.write(slots.tobytes())
+        f.write(records)
+        f.write(corrections.tobytes())
+        f.write(corrections_blob)
+
+
+def _dict_cache_key(filenames: list[str], ignore_words: set[str]) -> str:
+    """Fingerprint every input that affects the merged misspellings."""
+    h = hashlib.sha256()
+    h.update(f"{_DICT_CACHE_VERSION}".encode())
+    for filename in filenames:
+        st = os.stat(filename)
+        h.update(f"\0{os.path.abspath(filename)}\0".encode())
+        h.update(f"{st.st_mtime_ns}:{st.st_size}".encode())
+    for word in sorted(ignore_words):
+        h.update(f"\1{word}".encode())
+    return h.hexdigest()[:32]
+
+
+def _save_dict_cache(cache_file: str, misspellings: Misspellings) -> None:
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        write_mapped_dict(tmp_file, misspellings)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # Caching is best effort: a read-only or full disk must not
+        # prevent the spell check itself from running.
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def build_dict_cached(
+    filenames: list[str],
+    ignore_words: set[str],
+    cache_dir: str,
+) -> Mapping[str, Misspelling]:
+    """Merge dictionaries like build_dict(), reusing a cache in cache_dir.
+
+    The cache is a binary dictionary file that is memory-mapped, so
+    concurrent codespell processes share it. It is invalidated
+    automatically whenever a dictionary file is modified, the selection of
+    dictionaries changes, or the ignored words differ.
+    """
+    cache_file = os.path.join(
+        cache_dir, f"dictionary-{_dict_cache_key(filenames, ignore_words)}.bin"
+    )
+    try:
+        return MappedMisspellings(cache_file)
+    except (OSError, ValueError):
+        pass
+    misspellings = Misspellings()
+    for filename in filenames:
+        build_dict(filename, misspellings, ignore_words)
+    _save_dict_cache(cache_file, misspellings)
+    misspellings.compact()
+    return misspellings
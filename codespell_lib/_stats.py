@@ -0,0 +1,91 @@
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see
+# https://www.gnu.org/licenses/old-licenses/gpl-2.0.html.
+"""
+Copyright (C) 2010-2011  Lucas De Marchi <lucas.de.marchi@gmail.com>
+Copyright (C) 2011  ProFUSION embedded systems
+"""
+
+import json
+import time
+
+# The phases of a run, in the order they first happen.
+PHASES = (
+    "parse_options",
+    "build_dict",
+    "walk",
+    "read",
+    "check",
+    "write",
+    "output",
+)
+# Most lines are left out by a lookup of the distinct words of a file, so
+# candidate_lines and candidate_tokens count the lines checked in full, that
+# may hold a misspelling, and the words looked up on them, not all read.
+COUNTERS = (
+    "files_visited",
+    "skipped_glob",
+    "skipped_hidden",
+    "skipped_binary",
+    "bytes_read",
+    "candidate_lines",
+    "candidate_tokens",
+    "dictionary_hits",
+    "verdict_cache_hits",
+    "verdict_cache_misses",
+    "misspellings",
+    "fixes_written",
+)
+
+
+class RunStats:
+    """Timings of the phases of a run and counters, reported by --stats.
+
+    A single phase is timed at a time: entering a phase ends the previous
+    one, so the timings add up to the time the run was timed.
+    """
+
+    def __init__(self) -> None:
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._phase = ""
+        self._since = 0.0
+
+    def enter(self, phase: str) -> None:
+        now = time.perf_counter()
+        if self._phase:
+            self.timings[self._phase] += now - self._since
+        self._phase = phase
+        self._since = now
+
+    def stop(self) -> None:
+        self.enter("")
+
+    def report(self, stats_format: str) -> str:
+        """Return the timings and counters as a table or as JSON."""
+        total = sum(self.timings.values())
+        if stats_format == "json":
+            timings = {**self.timings, "total": total}
+            return json.dumps({"timings": timings, "counters": self.counters})
+
+        lines = [f"{'phase':<24}{'seconds':>12}{'%':>8}"]
+        for phase, seconds in self.timings.items():
+            percent = 100 * seconds / total if total else 0.0
+            lines.append(f"{phase:<24}{seconds:>12.6f}{percent:>8.1f}")
+        lines.append(f"{'total':<24}{total:>12.6f}{100.0:>8.1f}")
+        lines.append("")
+        lines.append(f"{'counter':<24}{'value':>12}")
+        lines.extend(
+            f"{counter:<24}{value:>12}" for counter, value in self.counters.items()
+        )
+        return "\n".join(lines)
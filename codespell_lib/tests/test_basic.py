@@ -1,10 +1,16 @@
 import contextlib
 import inspect
+import json
 import os
 import os.path as op
+import pstats
 import re
+import shutil
+import socket
 import subprocess
 import sys
+import threading
+import tracemalloc
 from collections.abc import Generator
 from io import StringIO
 from pathlib import Path
@@ -22,6 +28,14 @@ from codespell_lib._codespell import (
     EX_USAGE,
     _builtin_dictionaries,
     uri_regex_def,
+    word_regex_def,
+)
+from codespell_lib._spellchecker import (
+    MappedMisspellings,
+    Misspelling,
+    Misspellings,
+    build_dict,
+    write_mapped_dict,
 )
 
 
@@ -200,6 +214,35 @@ def test_write_changes_lists_changes(
     assert corrected == "This is abandoned\nAnd this is occurred\nAlso the typo\n"
 
 
+def test_write_changes_several_per_line(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that -w fixes every whole word occurrence of every misspelling."""
+    fname = tmp_path / "misspelled.txt"
+    fname.write_text(
+        "teh abandonned teh x-abandonned Teh abandonnedly occured_ teh\n"
+        "occured, occured\n"
+    )
+    result = cs.main("-w", fname, std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == 0
+    assert fname.read_text() == (
+        "the abandoned the x-abandoned The abandonnedly occured_ the\n"
+        "occurred, occurred\n"
+    )
+    assert stderr.count("misspelled.txt:1:") == 3
+    assert stderr.count("misspelled.txt:2:") == 1
+
+    # fixes apply in turn, each to the line as fixed by the previous ones
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("behavior->behaviour\nbehaviour->behavior\n")
+    fname.write_text("strange behavior. Improve behaviour.\n")
+    assert cs.main("-D", dictionary, "-w", fname) == 0
+    assert fname.read_text() == "strange behavior. Improve behavior.\n"
+
+
 def test_default_word_parsing(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -355,6 +398,32 @@ def test_summary(
     assert "abandonned" in stdout.split()[-2]
 
 
+def test_jobs(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that checking files in parallel does not change the output."""
+    for i in range(40):
+        subdir = tmp_path / f"d{i % 3}"
+        subdir.mkdir(exist_ok=True)
+        (subdir / f"f{i}.txt").write_text(f"{i} abandonned\n" + "teh\n" * (i % 4))
+    (tmp_path / "binary.bin").write_bytes(b"\x00abandonned")
+    args = ("-s", "-q", "0", tmp_path)
+    expected = cs.main(*args, std=True)
+    assert isinstance(expected, tuple)
+    assert expected[0] == 100
+    assert cs.main("-j", "3", *args, std=True) == expected
+    assert cs.main("--jobs", "0", *args, std=True) == expected
+    result = cs.main("-j", "2", "-i", "1", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "--interactive" in stderr
+    # fixes are written by the workers
+    assert cs.main("-j", "2", "-w", tmp_path) == 0
+    assert cs.main(tmp_path) == 0
+
+
 def test_ignore_dictionary(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -393,6 +462,150 @@ def test_ignore_dictionary(
     assert cs.main("-I", f"{fname_dummy1},{fname},{fname_dummy2}", bad_name) == 1
 
 
+def test_misspellings_store(tmp_path: Path) -> None:
+    """Test the compact mapping used to store the dictionaries."""
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text(
+        "abandonned->abandoned\nabondon->abandon\nabandonned2->abandoned\n"
+    )
+    misspellings = Misspellings()
+    build_dict(str(dictionary), misspellings, {"abondon"})
+    assert len(misspellings) == 2
+    assert sorted(misspellings) == ["abandonned", "abandonned2"]
+    assert "abondon" not in misspellings
+    misspellings.compact()
+    assert not misspellings._interned
+    _keys, indices, table = misspellings.to_tables()
+    assert indices == [0, 0]  # identical corrections are shared
+    assert table == [("abandoned", True, "")]
+    # changes made to entries, e.g. in interactive mode, persist
+    misspellings["abandonned"].fix = False
+    assert misspellings["abandonned"].fix is False
+    assert misspellings["abandonned2"].fix is True
+    misspellings["foo"] = Misspelling("bar", False, "reason")
+    restored = Misspellings.from_tables(*misspellings.to_tables())
+    assert {k: (v.data, v.fix, v.reason) for k, v in restored.items()} == {
+        "abandonned": ("abandoned", False, ""),
+        "abandonned2": ("abandoned", True, ""),
+        "foo": ("bar", False, "reason"),
+    }
+    # corrections are still shared after compacting
+    restored.compact()
+    restored.add("abandonned3", "abandoned", True, "")
+    assert restored.to_tables()[1][-1] == restored.to_tables()[1][1]
+
+
+def test_mapped_misspellings(tmp_path: Path) -> None:
+    """Test the memory-mapped binary dictionary format."""
+    misspellings = Misspellings()
+    misspellings["abandonned"] = Misspelling("abandoned", True, "")
+    misspellings["ackward"] = Misspelling("awkward, backward", False, "")
+    misspellings["wasn’t"] = Misspelling("was not", False, "disabled")  # noqa: RUF001
+    fname = tmp_path / "dictionary.bin"
+    write_mapped_dict(str(fname), misspellings)
+    mapped = MappedMisspellings(str(fname))
+    assert len(mapped) == 3
+    assert sorted(mapped) == sorted(misspellings)
+    for key, misspelling in misspellings.items():
+        assert key in mapped
+        assert mapped[key].data == misspelling.data
+        assert mapped[key].fix == misspelling.fix
+        assert mapped[key].reason == misspelling.reason
+    assert "abandoned" not in mapped
+    assert "\udcff" not in mapped
+    with pytest.raises(KeyError):
+        mapped["abandoned"]
+    # changes made to entries, e.g. in interactive mode, persist
+    mapped["ackward"].data = "awkward"
+    assert mapped["ackward"].data == "awkward"
+    # keys are not limited to 64 KiB
+    long_key = "x" * (1 << 17)
+    misspellings[long_key] = Misspelling("y", True, "")
+    write_mapped_dict(str(fname), misspellings)
+    assert MappedMisspellings(str(fname))[long_key].data == "y"
+    fname.write_bytes(b"garbage")
+    with pytest.raises(ValueError, match="not a binary dictionary"):
+        MappedMisspellings(str(fname))
+
+
+def test_dictionary_cache(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test caching of the parsed dictionaries with --cache-dir."""
+    cache_dir = tmp_path / "cache"
+    bad_name = tmp_path / "bad.txt"
+    bad_name.write_text("abandonned\nfoo\n")
+    assert cs.main("--cache-dir", cache_dir, bad_name) == 1
+    assert len(list(cache_dir.glob("dictionary-*"))) == 1
+    assert cs.main("--cache-dir", cache_dir, bad_name) == 1
+    assert len(list(cache_dir.glob("dictionary-*"))) == 1
+    # ignored words and the builtin selection are part of the key
+    assert cs.main("--cache-dir", cache_dir, "-L", "abandonned", bad_name) == 0
+    assert cs.main("--cache-dir", cache_dir, "--builtin", "names", bad_name) == 0
+    assert len(list(cache_dir.glob("dictionary-*"))) == 3
+    # modifying a dictionary invalidates the cache
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("foo->bar\n")
+    assert cs.main("--cache-dir", cache_dir, "-D", dictionary, bad_name) == 1
+    dictionary.write_text("foo->bar\nabandonned->abandoned\n")
+    os.utime(dictionary, ns=(0, 0))
+    assert cs.main("--cache-dir", cache_dir, "-D", dictionary, bad_name) == 2
+    # a corrupted cache file is rebuilt
+    for cache_file in cache_dir.glob("dictionary-*"):
+        cache_file.write_bytes(b"garbage")
+    assert cs.main("--cache-dir", cache_dir, bad_name) == 1
+
+
+def test_results_cache(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test reusing the results of unchanged files with --cache-dir."""
+    cache_dir = tmp_path / "cache"
+    results_dir = cache_dir / "results"
+    src = tmp_path / "src"
+    src.mkdir()
+    bad_name = src / "bad.txt"
+    bad_name.write_text("abandonned\nteh\n")
+    good_name = src / "good.txt"
+    good_name.write_text("good\n")
+    args = ("-s", "--cache-dir", cache_dir, src)
+    expected = cs.main(*args, std=True)
+    assert isinstance(expected, tuple)
+    assert expected[0] == 2
+    entries = list(results_dir.glob("*/*"))
+    assert len(entries) == 2
+    assert cs.main(*args, std=True) == expected
+    assert cs.main("-j", "2", *args, std=True) == expected
+    # the results of unchanged files are replayed from the cache
+    for entry in entries:
+        entry.write_text(entry.read_text().replace("abandonned", "abandonnned"))
+    assert "abandonnned" in cs.main(*args, std=True)[1]  # type: ignore[index]
+    # modified files are checked again
+    bad_name.write_text("abandonned\n")
+    assert cs.main(*args) == 1
+    # other options that change the output use other entries
+    assert cs.main("-L", "abandonned", *args) == 0
+    assert cs.main(*args) == 1
+    # the entries of a file found by another path are not replayed
+    monkeypatch.chdir(src)
+    result = cs.main("--cache-dir", cache_dir, ".", std=True)
+    assert isinstance(result, tuple)
+    assert result[1].startswith(f"{os.path.join('.', 'bad.txt')}:1: abandonned")
+    monkeypatch.chdir(tmp_path)
+    # results are not cached when fixing files
+    for entry in results_dir.glob("*/*"):
+        entry.unlink()
+    assert cs.main("-w", "--cache-dir", cache_dir, src) == 0
+    assert not list(results_dir.glob("*/*"))
+    # the least recently used results are evicted above the size limit
+    bad_name.write_text("abandonned\n")
+    assert cs.main("--cache-max-size", "0", "--cache-dir", cache_dir, src) == 1
+    assert not list(results_dir.glob("*/*"))
+
+
 def test_ignore_words_with_cases(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -499,6 +712,49 @@ def test_inline_ignores(
     assert cs.main(d) == expected_error_count
 
 
+def test_word_verdicts(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that cached word verdicts honour ignores and are shared by files."""
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text(
+            "abandonned Abandonned\n"
+            "abandonned  # codespell:ignore abandonned\n"
+            "abandonned Abandonned\n"
+        )
+    result = cs.main(tmp_path, std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 8
+    assert stdout.count("Abandonned ==> Abandoned") == 4
+    result = cs.main("--stats", "--format=jsonl", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    counters = json.loads(result[2].splitlines()[-2])["counters"]
+    # one miss for each distinct word, including those of the directive
+    assert counters["verdict_cache_misses"] == 4
+    assert counters["verdict_cache_hits"] == 12
+    assert cs.main("-L", "abandonned", tmp_path) == 0
+
+    # each spellchecker caches the verdicts of its own dictionaries
+    checker = cs_.Spellchecker()
+    other = cs_.Spellchecker("-L", "abandonned")
+    for _ in range(2):
+        assert [f.word for f in checker.check_text("abandonned")] == ["abandonned"]
+        assert [f.word for f in other.check_text("teh")] == ["teh"]
+    assert checker._word_verdicts.stats() == (1, 1)
+    assert other._word_verdicts.stats() == (1, 1)
+
+    # the fixes chosen interactively apply to the words already seen
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("teh->the, ten,\n")
+    fname = tmp_path / "c.txt"
+    fname.write_text("teh\nTeh teh\n")
+    with FakeStdin("\n0\n"):
+        assert cs.main("-D", dictionary, "-w", "-i", "2", fname) == 0
+    assert fname.read_text() == "teh\nThe the\n"
+
+
 @pytest.mark.parametrize(
     ("content", "expected_error_count"),
     [
@@ -583,6 +839,217 @@ def test_ignore_next_line(
     assert cs.main(d) == expected_error_count
 
 
+def test_whole_buffer_tokenization(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that finding candidate lines first does not change the output."""
+    fname = tmp_path / "bad.txt"
+    fname.write_text(
+        "abandonned\n"
+        "good line\n"
+        "# codespell:ignore-next-line\n"
+        "abandonned teh\n"
+        "x = 1  # codespell:ignore-next-line teh\n"
+        "abandonned teh\r\n"
+        "nothing\r"
+        "Abandonned and ABANDONNED \\nin\n"
+        "excluded abandonned\n"
+        "see https://example.com/abandonned or abandonned@example.com\n"
+        "abandonned # codespell:ignore\n"
+        "teh"
+    )
+    exclude = tmp_path / "exclude.txt"
+    exclude.write_text("excluded abandonned\n")
+    # an equivalent --regex checks every line instead
+    for args in (
+        (),
+        ("-C", "1"),
+        ("-x", exclude, "--uri-ignore-words-list", "abandonned", "-s"),
+    ):
+        expected = cs.main(*args, "-r", f"(?:{word_regex_def})", fname, std=True)
+        assert cs.main(*args, fname, std=True) == expected
+    assert cs.main(fname) == 8
+    assert cs.main("-w", fname) == 0
+    assert cs.main(fname) == 0
+    assert fname.read_text().count("abandonned") == 2
+
+
+def test_ascii_fast_path(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that pure ASCII files get the same findings as other files."""
+    text = (
+        "abandonned\x1cabandonned\tabandonned_x x-abandonned abandonned's\n"
+        "'abandonned' Abandonned ABANDONNED 1abandonned\\nin\n"
+        "teh\r\nabandonned\x0babandonned\x0cteh"
+    )
+    ascii_file = tmp_path / "ascii.txt"
+    ascii_file.write_text(text, newline="")
+    utf8_file = tmp_path / "utf8.txt"
+    utf8_file.write_text(text + "\n\n\né\n", newline="")
+    for args in ((), ("-B", "1"), ("-L", "Abandonned")):
+        ascii_result = cs.main(*args, ascii_file, std=True)
+        utf8_result = cs.main(*args, utf8_file, std=True)
+        assert isinstance(ascii_result, tuple)
+        assert isinstance(utf8_result, tuple)
+        assert ascii_result[0] == utf8_result[0] > 0
+        assert ascii_result[1] == utf8_result[1].replace(
+            str(utf8_file), str(ascii_file)
+        )
+
+
+def test_streaming(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that checking files in windows of lines does not change the output."""
+    monkeypatch.setattr(cs_._codespell, "_STREAM_CHUNK_SIZE", 40)
+    lines = [f"line {i}\n" for i in range(60)]
+    lines[0] = "abandonned first\n"
+    lines[10] = "# codespell:ignore-next-line\n"
+    lines[11] = "abandonned ignored\n"
+    lines[20] = "abandonned\n"
+    lines[21] = "abandonned again\n"
+    lines[30] = "x = 1  # codespell:ignore-next-line teh\n"
+    lines[31] = "teh abandonned\n"
+    lines[-1] = "abandonned last"
+    fname = tmp_path / "big.txt"
+    fname.write_text("".join(lines))
+    latin1 = tmp_path / "latin1.txt"
+    latin1.write_bytes("".join(lines).encode() + "\nabandonned é\n".encode("latin-1"))
+    # files are not streamed with multiline ignores
+    whole = ("--ignore-multiline-regex", "NEVER_MATCHED")
+    for args in (
+        (),
+        ("-C", "2"),
+        ("-A", "5"),
+        ("-B", "3", "-s"),
+        ("-r", f"(?:{word_regex_def})"),
+    ):
+        for path in (fname, latin1):
+            expected = cs.main(*args, *whole, path, std=True)
+            assert cs.main(*args, path, std=True) == expected
+    assert cs.main(fname) == 5
+    assert cs.main(latin1) == 6
+    # a file is checked once, in the encoding it turns out to have
+    parse_stream = cs_._codespell._parse_stream
+    with mock.patch.object(
+        cs_._codespell, "_parse_stream", side_effect=parse_stream
+    ) as mocked:
+        assert cs.main(latin1) == 6
+        assert mocked.call_count == 1
+    # an encoding that fails is reported before any misspelling
+    monkeypatch.setattr(cs_._codespell.FileOpener, "init_chardet", lambda _: None)
+    monkeypatch.setattr(
+        cs_._codespell.FileOpener, "detect_encoding", lambda *_: "utf-8"
+    )
+    capsys.readouterr()
+    with pytest.raises(UnicodeDecodeError):
+        cs.main("-e", latin1)
+    stdout, stderr = capsys.readouterr()
+    assert not stdout
+    assert "Could not detect encoding" in stderr
+
+    with fname.open() as f:
+        monkeypatch.setattr(sys, "stdin", f)
+        result = cs.main("-", std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 5
+    assert stdout.startswith("1: abandonned first\n")
+
+
+def test_candidate_words_prefilter(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that lines are only checked in files with candidate words."""
+    good = tmp_path / "good.txt"
+    good.write_text("nothing to see here\n" * 100)
+    bad = tmp_path / "bad.txt"
+    bad.write_text("fine\n" * 50 + "ABANDONNED abandonnedd\n" + "fine\n" * 50)
+    parse_lines = cs_._codespell.parse_lines
+    with mock.patch.object(
+        cs_._codespell, "parse_lines", side_effect=parse_lines
+    ) as mocked:
+        assert cs.main(good) == 0
+        assert not mocked.called
+        assert cs.main(bad) == 1
+        assert mocked.call_count == 1
+        assert list(mocked.call_args.kwargs["check_lines"]) == [50]
+        # ignored words are no candidates
+        assert cs.main("-L", "abandonned", bad) == 0
+        assert mocked.call_count == 1
+        # other settings check every line
+        assert cs.main("--ignore-regex", "^$", good) == 0
+        assert mocked.call_count == 2
+        assert mocked.call_args.kwargs["check_lines"] is None
+
+
+def test_spellchecker(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test checking text in process."""
+    monkeypatch.chdir(tmp_path)
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("abandonned->abandoned\nnto->not, disabled\nteh->the, ten,\n")
+    checker = cs_.Spellchecker("-D", str(dictionary), "-L", "ignored")
+    findings = checker.check_text(
+        "Teh abandonned  x nto\r\nabandonned # codespell:ignore\n\n  ABANDONNED\n"
+    )
+    assert list(findings) == [
+        cs_.Finding(1, 1, "Teh", "The, Ten", "", False),
+        cs_.Finding(1, 5, "abandonned", "abandoned", "", True),
+        cs_.Finding(1, 19, "nto", "not", "disabled", False),
+        cs_.Finding(4, 3, "ABANDONNED", "ABANDONED", "", True),
+    ]
+    # the checker is reusable, and prints nothing
+    assert [f.word for f in checker.check_text("abandonned")] == ["abandonned"]
+    assert not list(checker.check_text(""))
+
+    with pytest.raises(ValueError, match="invalid --regex"):
+        cs_.Spellchecker("--regex", "(")
+    with pytest.raises(ValueError, match="cannot find dictionary file"):
+        cs_.Spellchecker("-D", str(tmp_path / "missing"))
+    # invalid options raise instead of printing the usage and exiting
+    with pytest.raises(ValueError, match="unrecognized arguments: --bogus"):
+        cs_.Spellchecker("--bogus")
+    with pytest.raises(ValueError, match="invalid choice: 99"):
+        cs_.Spellchecker("-q", "99")
+    assert capsys.readouterr() == ("", "")
+
+
+def test_spellchecker_records(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test checking many texts at once."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cs_._codespell, "_BATCH_SIZE", 10)
+    records = [
+        ("a", "fine"),
+        ("b", "aban"),
+        ("c", "donned abandonned\nteh"),
+        ("d", ""),
+        ("e", "x" * 20),
+        ("f", "teh # codespell:ignore"),
+        ("g", "Teh"),
+    ]
+    for args in ((), ("--regex", "[a-zA-Z]+")):
+        checker = cs_.Spellchecker(*args)
+        assert list(checker.check_records(records)) == [
+            ("c", cs_.Finding(1, 8, "abandonned", "abandoned", "", True)),
+            ("c", cs_.Finding(2, 1, "teh", "the", "", True)),
+            ("g", cs_.Finding(1, 1, "Teh", "The", "", True)),
+        ]
+        assert not list(checker.check_records([]))
+
+
 def test_custom_regex(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -683,6 +1150,23 @@ def test_encoding(
     assert "WARNING: Binary file" in stderr
 
 
+def test_read_once(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that files are opened once, even when decoding them fails."""
+    fname = tmp_path / "tmp"
+    fname.write_bytes(b"Speling error, non-ASCII: h\xe9t\xe9rog\xe9n\xe9it\xe9\n")
+    with mock.patch("codespell_lib._codespell.open", create=True, wraps=open) as m:
+        result = cs.main("-q", "0", fname, std=True)
+    assert isinstance(result, tuple)
+    code, stdout, stderr = result
+    assert code == 1
+    assert "Speling" in stdout
+    assert 'Trying next encoding "iso-8859-1"' in stderr
+    assert [call.args[0] for call in m.call_args_list].count(str(fname)) == 1
+
+
 def test_unknown_encoding_chardet(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -722,6 +1206,63 @@ def test_ignore(
     assert cs.main("--skip=*.js", goodtxt, badtxt, badjs) == 1
 
 
+def test_ignore_directories(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test globs matching directories only, and pruning of skipped paths."""
+    (tmp_path / "build").write_text("abandonned\n")
+    (tmp_path / "src" / "build").mkdir(parents=True)
+    (tmp_path / "src" / "build" / "bad.txt").write_text("abandonned\n")
+    (tmp_path / "src" / "bad.txt").write_text("abandonned\n")
+    assert cs.main(tmp_path) == 3
+    assert cs.main("--skip=build", tmp_path) == 1
+    assert cs.main("--skip=build/", tmp_path) == 2
+    assert cs.main("--skip=bui?d/", tmp_path) == 2
+    assert cs.main("--skip=*.txt,build/", tmp_path / "build") == 1
+
+    walked = []
+    real_scandir = os.scandir
+
+    def scandir(path: str) -> Any:
+        walked.append(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    src = tmp_path / "src"
+    assert cs.main(f"--skip={src / 'build'}", tmp_path) == 2
+    assert walked == [str(tmp_path), str(src)]
+
+
+def test_walk_files(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that walked files are found like os.walk() and not stat'ed again."""
+    (tmp_path / "b" / "c").mkdir(parents=True)
+    (tmp_path / "a").mkdir()
+    (tmp_path / ".hidden").mkdir()
+    for path in ("z.txt", "b/y.txt", "b/c/x.txt", "a/w.txt", ".hidden/v.txt"):
+        (tmp_path / path).write_text("abandonned\n")
+    (tmp_path / "link").symlink_to(tmp_path / "b", target_is_directory=True)
+    (tmp_path / "b" / "u.txt").symlink_to(tmp_path / "z.txt")
+
+    expected: list[str] = []
+    for root, dirs, files in os.walk(tmp_path):
+        dirs[:] = [dir_ for dir_ in dirs if not dir_.startswith(".")]
+        expected.extend(os.path.join(root, file_) for file_ in sorted(files))
+    found = cs_._codespell._iter_files(
+        [str(tmp_path)], cs_._codespell.GlobMatch([]), False
+    )
+    assert [filename for filename, _ in found] == expected
+
+    with mock.patch.object(os, "stat", wraps=os.stat) as os_stat:
+        assert cs.main(tmp_path) == 5
+    stated = [os.fspath(call.args[0]) for call in os_stat.call_args_list]
+    assert not [path for path in stated if path.endswith(".txt")]
+
+
 def test_check_filename(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -846,6 +1387,452 @@ def test_check_hidden(
     assert cs.main("--check-hidden", "--check-filenames", tmp_path) == 11
 
 
+def _git(tmp_path: Path, *args: str) -> None:
+    subprocess.run(  # noqa: S603
+        ["git", *args],  # noqa: S607
+        cwd=tmp_path,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_dedup(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test checking files reached through links or with the same content once."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "bad.txt").write_text("abandonned\n")
+    os.link(tmp_path / "a" / "bad.txt", tmp_path / "a" / "hard.txt")
+    (tmp_path / "link").symlink_to(tmp_path / "a", target_is_directory=True)
+    (tmp_path / "copy.txt").write_text("abandonned\n")
+    (tmp_path / "other.txt").write_text("abandonned\nteh\n")
+    (tmp_path / "abandonned.txt").write_text("abandonned\n")
+    assert cs.main(tmp_path) == 6
+    assert cs.main(tmp_path, tmp_path / "link" / "bad.txt") == 7
+    assert cs.main("--dedup=inode", tmp_path, tmp_path / "link" / "bad.txt") == 5
+
+    result = cs.main("-f", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    expected = result[1].replace(
+        f"{tmp_path / 'a' / 'hard.txt'}:1: abandonned ==> abandoned\n", ""
+    )
+    with mock.patch("builtins.open", wraps=open) as mocked_open:
+        result = cs.main("--dedup=content", "-f", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 6
+    assert stdout == expected
+    assert stdout.count("\n") == 6
+    # the content of each file is read once, to be hashed and checked, and
+    # only files of the same size are hashed
+    opened = [os.fspath(call.args[0]) for call in mocked_open.call_args_list]
+    assert opened.count(str(tmp_path / "other.txt")) == 1
+    from codespell_lib._cache import file_digest
+
+    with mock.patch.object(
+        cs_._codespell, "file_digest", side_effect=file_digest
+    ) as mocked:
+        assert cs.main("--dedup=content", tmp_path) == 5
+    assert mocked.call_count == 3
+
+    # findings and warnings are reported under the name of each file
+    (tmp_path / "enc").mkdir()
+    content = b"abandonned\n" + "é abandonned\n".encode("latin-1")
+    for name in ("x.txt", "y.txt"):
+        (tmp_path / "enc" / name).write_bytes(content)
+    expected_stdout = expected_stderr = ""
+    for name in ("x.txt", "y.txt"):
+        result = cs.main("-B", "1", tmp_path / "enc" / name, std=True)
+        assert isinstance(result, tuple)
+        expected_stdout += result[1]
+        # without the count of misspellings
+        expected_stderr += result[2].rsplit("\n", 2)[0] + "\n"
+    result = cs.main("--dedup=content", "-B", "1", tmp_path / "enc", std=True)
+    assert isinstance(result, tuple)
+    code, stdout, stderr = result
+    assert code == 4
+    assert stdout == expected_stdout
+    assert stderr == f"{expected_stderr}4\n"
+    assert "y.txt" in stderr
+
+    result = cs.main("--dedup=content", "-w", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "--dedup=content cannot be used" in stderr
+
+
+def test_files_from(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test reading the files to check from a list."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "d").mkdir()
+    (tmp_path / "d" / "bad.txt").write_text("abandonned\n")
+    (tmp_path / "b.txt").write_text("abandonned\n")
+    (tmp_path / "a b.txt").write_text("abandonned\n")
+    (tmp_path / "unlisted.txt").write_text("abandonned\n")
+    listed = tmp_path / "list"
+    for paths in (b"b.txt\0d\0a b.txt\0", b"b.txt\r\nd\n\na b.txt"):
+        listed.write_bytes(paths)
+        result = cs.main("--files-from", listed, std=True)
+        assert isinstance(result, tuple)
+        code, stdout, _ = result
+        assert code == 3
+        assert [line.split(":")[0] for line in stdout.splitlines()] == [
+            "b.txt",
+            os.path.join("d", "bad.txt"),
+            "a b.txt",
+        ]
+    assert cs.main("--files-from", listed, "unlisted.txt") == 4
+
+    # the separator is known once the first path ends
+    reads = [b"b.t", b"xt\0d", b"\0a b.txt"]
+    paths_file = mock.Mock(read1=lambda _: reads.pop(0) if reads else b"")
+    assert list(cs_._codespell._read_paths(paths_file)) == ["b.txt", "d", "a b.txt"]
+
+    result = cs.main("--files-from", tmp_path / "missing", std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "ERROR: --files-from:" in stderr
+
+
+def test_format(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test reporting misspellings as JSON lines or as a SARIF log."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "bad.txt").write_text("abandonned\nx acess\n")
+    (tmp_path / "abandonned.txt").write_text("ok\n")
+    result = cs.main("--format=jsonl", "-f", "bad.txt", "abandonned.txt", std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 3
+    findings = [json.loads(line) for line in stdout.splitlines()]
+    assert findings[2] == {
+        "file": "bad.txt",
+        "line": 2,
+        "column": 3,
+        "word": "acess",
+        "correction": "access",
+        "reason": "",
+        "fixable": True,
+    }
+    assert [(f["file"], f["line"]) for f in findings] == [
+        ("abandonned.txt", 0),
+        ("bad.txt", 1),
+        ("bad.txt", 2),
+    ]
+
+    for args in ((), ("--dedup=content", "--jobs=1"), ("--jobs=2",)):
+        (tmp_path / "copy.txt").write_text("x acess\n")
+        result = cs.main("--format=sarif", *args, ".", std=True)
+        assert isinstance(result, tuple)
+        code, stdout, _ = result
+        assert code == 3
+        (run,) = json.loads(stdout)["runs"]
+        assert run["tool"]["driver"]["name"] == "codespell"
+        assert sorted(
+            (
+                result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"],
+                result["locations"][0]["physicalLocation"]["region"]["startLine"],
+                result["message"]["text"],
+            )
+            for result in run["results"]
+        ) == [
+            ("bad.txt", 1, "abandonned ==> abandoned"),
+            ("bad.txt", 2, "acess ==> access"),
+            ("copy.txt", 1, "acess ==> access"),
+        ]
+
+    (tmp_path / "empty").mkdir()
+    result = cs.main("--format=sarif", "empty", std=True)
+    assert isinstance(result, tuple)
+    assert json.loads(result[1])["runs"][0]["results"] == []
+
+    result = cs.main("--format=jsonl", "--summary", "bad.txt", std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "--format=jsonl cannot be used" in stderr
+
+    # the text fixed on stdin would be written among the findings
+    with FakeStdin("abandonned\n"):
+        result = cs.main("--format=sarif", "-w", "-", std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "--format=sarif cannot be used together with --write-changes" in stderr
+    assert cs.main("--format=sarif", "-w", "bad.txt") == 0
+
+
+def test_stats(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test reporting the timings and counters of a run."""
+    (tmp_path / "bad.txt").write_text("abandonned\nfine\nx acess acess\n")
+    (tmp_path / "good.txt").write_text("fine\n")
+    (tmp_path / ".hidden.txt").write_text("abandonned\n")
+    (tmp_path / "skip.txt").write_text("abandonned\n")
+    (tmp_path / "binary.bin").write_bytes(b"\x00abandonned\n")
+    result = cs.main("--stats", "--format=jsonl", "-S", "skip.txt", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == 3
+    # the count stays the last line
+    stats = json.loads(stderr.splitlines()[-2])
+    assert set(stats["timings"]) >= {"parse_options", "build_dict", "check", "total"}
+    assert stats["counters"] == {
+        "files_visited": 3,
+        "skipped_glob": 1,
+        "skipped_hidden": 1,
+        "skipped_binary": 1,
+        "bytes_read": 35,
+        "candidate_lines": 2,
+        "candidate_tokens": 4,
+        "dictionary_hits": 3,
+        "verdict_cache_hits": 1,
+        "verdict_cache_misses": 3,
+        "misspellings": 3,
+        "fixes_written": 0,
+    }
+
+    result = cs.main("--stats", tmp_path / "good.txt", std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == 0
+    assert re.search(r"^files_visited +1$", stderr, re.MULTILINE)
+    assert re.search(r"^total +[0-9.]+ +100\.0$", stderr, re.MULTILINE)
+
+    result = cs.main("--stats", "--jobs=2", tmp_path, std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "--stats cannot be used" in stderr
+
+
+def test_profile(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test profiling a run."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "bad.txt").write_text("abandonned\n")
+    assert cs.main("--profile=cpu", "bad.txt") == 1
+    profile = pstats.Stats("codespell-cpu.prof").get_stats_profile()
+    assert {"build_dict", "parse_file", "parse_lines"} <= set(profile.func_profiles)
+
+    assert cs.main("--profile=mem", "--profile-output=mem.txt", "bad.txt") == 1
+    report = (tmp_path / "mem.txt").read_text()
+    assert report.startswith("Peak memory: ")
+    assert "_spellchecker.py:" in report
+
+    # memory freed before the end of the run is reported
+    from codespell_lib import _profile
+
+    tracemalloc.start()
+    try:
+        sampler = _profile._PeakSampler()
+        data = [bytearray(1024) for _ in range(1024)]
+        sampler.sample()
+        del data
+        snapshot = sampler.finish()
+    finally:
+        tracemalloc.stop()
+    report = _profile.format_allocations(snapshot, 0)
+    assert report.splitlines()[3].startswith(f"#1: {__file__}:")
+
+    result = cs.main("--profile=cpu", "--profile-output=missing/x", "bad.txt", std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "ERROR: --profile-output:" in stderr
+
+
+@pytest.mark.skipif(not shutil.which("git"), reason="needs git")
+def test_git_files(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test checking the files tracked by git only."""
+    #
+    #         tmp_path
+    #         ├── .hidden
+    #         │   └── tracked.txt
+    #         ├── build
+    #         │   └── tracked.txt
+    #         ├── subdir
+    #         │   └── tracked.txt
+    #         ├── tracked.txt
+    #         └── untracked.txt
+    #
+    _git(tmp_path, "init", "-q")
+    for dirname in (".hidden", "build", "subdir"):
+        (tmp_path / dirname).mkdir()
+        (tmp_path / dirname / "tracked.txt").write_text("abandonned\n")
+    (tmp_path / "tracked.txt").write_text("abandonned\n")
+    _git(tmp_path, "add", ".")
+    (tmp_path / "untracked.txt").write_text("abandonned\n")
+    assert cs.main(tmp_path) == 4
+    assert cs.main("--git-files", tmp_path) == 3
+    assert cs.main("--git-files", "--check-hidden", tmp_path) == 4
+    assert cs.main("--git-files", "--skip=build", tmp_path) == 2
+    assert cs.main("--git-files", "--skip=tracked.txt", tmp_path) == 0
+    assert cs.main("--git-files", tmp_path / "subdir") == 1
+    # files given explicitly are checked whether tracked or not
+    assert cs.main("--git-files", tmp_path / "untracked.txt") == 1
+    # deleted files are still in the index
+    (tmp_path / "build" / "tracked.txt").unlink()
+    assert cs.main("--git-files", tmp_path) == 2
+
+    not_a_repo = tmp_path / ".hidden"
+    _git(tmp_path, "rm", "-rq", "--cached", ".")
+    (tmp_path / ".git").rename(tmp_path / "not-git")
+    result = cs.main("--git-files", not_a_repo, std=True)
+    assert isinstance(result, tuple)
+    code, _, stderr = result
+    assert code == EX_USAGE
+    assert "ERROR: --git-files:" in stderr
+
+
+@pytest.mark.skipif(not shutil.which("git"), reason="needs git")
+def test_changed_since(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test checking the files changed since a git revision only."""
+    _git(tmp_path, "init", "-q")
+    for dirname in (".hidden", "build", "subdir"):
+        (tmp_path / dirname).mkdir()
+        (tmp_path / dirname / "old.txt").write_text("abandonned\n")
+    _git(tmp_path, "add", ".")
+    commit = ("-c", "user.name=codespell", "-c", "user.email=codespell@test")
+    _git(tmp_path, *commit, "commit", "-qm", "old")
+    _git(tmp_path, "tag", "old")
+    assert cs.main("--changed-since=old", tmp_path) == 0
+
+    for dirname in (".hidden", "build", "subdir"):
+        (tmp_path / dirname / "new.txt").write_text("abandonned\n")
+    _git(tmp_path, "add", ".")
+    (tmp_path / "subdir" / "old.txt").write_text("abandonned\nabandonned\n")
+    (tmp_path / "build" / "old.txt").unlink()
+    # changes in the work tree count, whether committed or not
+    assert cs.main("--changed-since=old", tmp_path) == 4
+    _git(tmp_path, *commit, "commit", "-qam", "new")
+    assert cs.main("--changed-since=old", tmp_path) == 4
+    assert cs.main("--changed-since=HEAD", tmp_path) == 0
+    assert cs.main("--changed-since=old", "--check-hidden", tmp_path) == 5
+    assert cs.main("--changed-since=old", "--skip=build", tmp_path) == 3
+    assert cs.main("--changed-since=old", tmp_path / "subdir") == 3
+
+    for rev in ("no-such-rev", "--output=x"):
+        result = cs.main(f"--changed-since={rev}", tmp_path, std=True)
+        assert isinstance(result, tuple)
+        code, _, stderr = result
+        assert code == EX_USAGE
+        assert "ERROR: --changed-since:" in stderr
+
+
+def test_diff(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test checking only the lines added by a diff."""
+    monkeypatch.chdir(tmp_path)
+    lines = [f"line {i}\n" for i in range(1, 21)]
+    lines[1] = "abandonned before\n"
+    lines[8] = "# codespell:ignore-next-line\n"
+    lines[9] = "abandonned after the directive\n"
+    lines[14] = "abandonned added\n"
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "test.txt").write_text("".join(lines))
+    diff = tmp_path / "test.diff"
+    diff.write_text(
+        "diff --git a/sub/test.txt b/sub/test.txt\n"
+        "--- a/sub/test.txt\n"
+        "+++ b/sub/test.txt\n"
+        "@@ -10 +10 @@\n"
+        "-line 10\n"
+        "+abandonned after the directive\n"
+        "@@ -15 +15 @@\n"
+        "-line 15\n"
+        "+abandonned added\n"
+        "diff --git a/abandonned.txt b/abandonned.txt\n"
+        "--- /dev/null\n"
+        "+++ b/abandonned.txt\n"
+        "@@ -0,0 +1,2 @@\n"
+        "+abandonned\n"
+        "+-- abandonned\n"
+    )
+    # the directive is found in the file, out of the hunks
+    result = cs.main("--diff", diff, "sub/test.txt", std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 1
+    assert stdout == "sub/test.txt:15: abandonned ==> abandoned\n"
+    assert cs.main("--diff", diff, "--skip=test.txt") == 2
+    # files that are not on disk only have the lines of the diff
+    assert cs.main("--diff", diff) == 3
+    assert cs.main("--diff", diff, "--check-filenames") == 4
+    # the paths in the diff are relative to the directories given
+    monkeypatch.chdir(tmp_path / "sub")
+    result = cs.main("--diff", diff, "..", std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 3
+    assert stdout.endswith("\n../sub/test.txt:15: abandonned ==> abandoned\n")
+    assert cs.main("--diff", diff, tmp_path) == 3
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sub" / "test.txt").unlink()
+    assert cs.main("--diff", diff, "sub/test.txt") == 2
+    with diff.open() as f:
+        monkeypatch.setattr(sys, "stdin", mock.Mock(buffer=f.buffer))
+        assert cs.main("--diff", "-", "sub/test.txt") == 2
+
+    assert cs.main("--diff", diff, "-w") == EX_USAGE
+    assert cs.main("--diff", diff, "--changed-since=HEAD") == EX_USAGE
+    assert cs.main("--diff", tmp_path / "missing.diff") == EX_USAGE
+    assert cs.main("--changed-lines-only") == EX_USAGE
+
+
+@pytest.mark.skipif(not shutil.which("git"), reason="needs git")
+def test_changed_lines_only(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test checking only the lines changed since a git revision."""
+    _git(tmp_path, "init", "-q")
+    lines = [f"line {i}\n" for i in range(1, 21)]
+    lines[1] = "abandonned before\n"
+    (tmp_path / "test.txt").write_text("".join(lines))
+    _git(tmp_path, "add", ".")
+    commit = ("-c", "user.name=codespell", "-c", "user.email=codespell@test")
+    _git(tmp_path, *commit, "commit", "-qm", "old")
+    assert cs.main("--changed-since=HEAD", tmp_path) == 0
+    lines[14] = "abandonned added\n"
+    (tmp_path / "test.txt").write_text("".join(lines))
+    (tmp_path / "new.txt").write_text("abandonned\n")
+    _git(tmp_path, "add", ".")
+    assert cs.main("--changed-since=HEAD", tmp_path) == 3
+    args = ("--changed-since=HEAD", "--changed-lines-only")
+    result = cs.main(*args, tmp_path / "test.txt", std=True)
+    assert isinstance(result, tuple)
+    code, stdout, _ = result
+    assert code == 1
+    assert stdout == f"{tmp_path / 'test.txt'}:15: abandonned ==> abandoned\n"
+    assert cs.main(*args, tmp_path) == 2
+    assert cs.main(*args, "--skip=new.txt", tmp_path) == 1
+
+
 def test_case_handling(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],
@@ -1632,6 +2619,110 @@ def test_stdin(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
         assert code == 1
 
 
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_daemon(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test checking files through the daemon."""
+    from codespell_lib import _daemon
+
+    bad_name = tmp_path / "bad.txt"
+    bad_name.write_text("abandonned\nAbandonned\n")
+    socket_path = str(tmp_path / "sock")
+    code = cs_.main(str(bad_name))
+    expected = (code, *capsys.readouterr())
+    assert expected[0] == EX_DATAERR
+
+    def client(*args: Any) -> tuple[int, str, str]:
+        stdout, stderr = StringIO(), StringIO()
+        code = _daemon.run_client(
+            [str(arg) for arg in args], socket_path, stdout, stderr
+        )
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    # without a daemon the client checks files itself
+    assert client(bad_name) == expected
+    dictionaries_memo: dict[str, Any] = {}
+    monkeypatch.setattr(cs_._codespell, "_dictionaries_memo", dictionaries_memo)
+    with _daemon.DaemonServer(socket_path) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            assert client(bad_name) == expected
+            assert client(bad_name) == expected
+            assert len(dictionaries_memo) == 1
+            code, stdout, _ = client("-L", "abandonned", bad_name)
+            assert (code, stdout) == (EX_OK, "")
+            assert len(dictionaries_memo) == 2
+            # files are relative to the working directory of the client
+            monkeypatch.chdir(tmp_path)
+            assert client("bad.txt")[0] == EX_DATAERR
+            assert client("--count", "bad.txt")[2] == "2\n"
+            assert client("--help")[0] == EX_OK
+            assert client("--daemon")[0] == EX_USAGE
+            with FakeStdin("Thsi is a line"):
+                assert client("-", "-w")[1] == "---\nThis is a line"
+            # paths and diffs are read from stdin as bytes
+            with FakeStdin("bad.txt\n"):
+                assert client("--files-from", "-")[0] == EX_DATAERR
+            with FakeStdin("+++ b/bad.txt\n@@ -0,0 +1 @@\n+abandonned\n"):
+                assert client("--diff", "-", "--count")[2] == "1\n"
+            # the daemon cannot ask for fixes
+            with FakeStdin("n\n"):
+                code, _, stderr = client("-i", "1", "-w", "bad.txt")
+            assert code == EX_USAGE
+            assert "--interactive cannot be used" in stderr
+            assert bad_name.read_text() == "abandonned\nAbandonned\n"
+        finally:
+            server.shutdown()
+            thread.join()
+    assert not os.path.exists(socket_path)
+
+
+def test_daemon_socket_path(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that the daemon socket is private to the user."""
+    from codespell_lib import _daemon
+
+    monkeypatch.delenv("CODESPELL_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert _daemon.default_socket_path() == str(tmp_path / "codespell.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr("tempfile.gettempdir", lambda: str(tmp_path))
+    socket_path = _daemon.default_socket_path()
+    assert os.path.dirname(socket_path) == _daemon._private_dir()
+    # a directory that others can access is refused
+    os.mkdir(_daemon._private_dir(), 0o700)
+    os.chmod(_daemon._private_dir(), 0o750)  # noqa: S103
+    with pytest.raises(OSError, match="not a directory private"):
+        _daemon._check_private_dir(_daemon._private_dir())
+    os.chmod(_daemon._private_dir(), 0o700)
+    _daemon._check_private_dir(_daemon._private_dir())
+    # only sockets are connected to
+    Path(socket_path).write_text("")
+    with pytest.raises(OSError, match="not a socket"):
+        _daemon._check_socket(socket_path)
+    assert _daemon._reads_stdin(["--files-from=-"])
+    assert _daemon._reads_stdin(["--diff", "-", "."])
+    assert not _daemon._reads_stdin(["-w", "."])
+
+
+def test_daemon_client_imports() -> None:
+    """Test that the client starts without importing the checker."""
+    script = (
+        "import sys, codespell_lib._daemon; "
+        "sys.exit('codespell_lib._codespell' in sys.modules)"
+    )
+    proc = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script], check=False
+    )
+    assert proc.returncode == 0
+
+
 def test_args_from_file(
     tmp_path: Path,
     capsys: pytest.CaptureFixture[str],